@@ -0,0 +1,75 @@
+"""
+Report the bytes/CPU trade-off of response compression for a full ``/items/`` page.
+
+Run from the project root::
+
+    python benchmarks/bench_compression.py
+"""
+
+import random
+import string
+import sys
+import time
+
+sys.path.append(".")
+
+from core.compression import (  # noqa: E402
+    CompressedVariantCache,
+    available_encodings,
+    compress,
+)
+from core.config import settings  # noqa: E402
+from core.response import StandardResponse  # noqa: E402
+from models import ItemPublic  # noqa: E402
+
+ROUNDS = 200
+LEVELS = {
+    "gzip": ("COMPRESSION_GZIP_LEVEL", [1, 6, 9]),
+    "br": ("COMPRESSION_BROTLI_QUALITY", [1, 4, 11]),
+    "zstd": ("COMPRESSION_ZSTD_LEVEL", [1, 3, 19]),
+}
+
+
+def make_page(rows: int = 100) -> bytes:
+    rng = random.Random(0)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(500)]
+    items = [
+        ItemPublic(
+            id=i,
+            owner_id=rng.randint(1, 50),
+            title=" ".join(rng.choices(words, k=4)),
+            description=" ".join(rng.choices(words, k=rng.randint(10, 60))),
+        )
+        for i in range(1, rows + 1)
+    ]
+    response = StandardResponse(status="success", message="Items retrieved successfully", data=items)
+    return response.model_dump_json().encode()
+
+
+def timed(func, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    body = make_page()
+    print(f"page size: {len(body)} bytes, min size threshold: {settings.COMPRESSION_MIN_SIZE} bytes")
+    print(f"{'encoding':<10}{'level':>6}{'bytes':>10}{'ratio':>8}{'compress us':>14}{'cached us':>12}")
+
+    for encoding in available_encodings():
+        setting, levels = LEVELS[encoding]
+        for level in levels:
+            setattr(settings, setting, level)
+            compressed = compress(body, encoding)
+            cold = timed(lambda: compress(body, encoding))
+            cache = CompressedVariantCache(settings.COMPRESSION_CACHE_BYTES)
+            cache.get_or_compress(body, encoding)
+            hot = timed(lambda: cache.get_or_compress(body, encoding))
+            ratio = len(body) / len(compressed)
+            print(f"{encoding:<10}{level:>6}{len(compressed):>10}{ratio:>8.2f}{cold:>14.1f}{hot:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compare the ORM and Core read paths of ``GET /items/`` for a 100-row page.
+
+Both paths read the same page from a scratch database and render the same JSON body; the ORM path mirrors what
+FastAPI does with ``response_model`` (validate ``Item`` instances into ``ItemPublic``, then serialize). Run from the
+project root::
+
+    python benchmarks/bench_list_path.py
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+sys.path.append(".")
+
+workdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/bench.db"
+os.environ["SHARD_URLS"] = "[]"
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlmodel import select  # noqa: E402
+
+from core.database import create_session, init_db  # noqa: E402
+from core.fastpath import item_listing  # noqa: E402
+from core.response import StandardResponse  # noqa: E402
+from models import Item, ItemPublic  # noqa: E402
+from services import ItemService  # noqa: E402
+
+ROWS = 10_000
+PAGE = 100
+ROUNDS = 300
+
+orm_adapter = TypeAdapter(StandardResponse[List[ItemPublic]])
+
+
+async def orm_page(offset: int) -> bytes:
+    async with create_session() as session:
+        live = select(Item).where(Item.deleted_at.is_(None))
+        items = (await session.execute(live.order_by(Item.id).offset(offset).limit(PAGE))).scalars().all()
+        response = {"status": "success", "data": items, "message": "Items retrieved successfully"}
+        return orm_adapter.dump_json(orm_adapter.validate_python(response, from_attributes=True))
+
+
+async def core_page(offset: int) -> bytes:
+    async with create_session() as session:
+        rows = await ItemService(session).read_item_rows(offset, PAGE)
+        return item_listing.serialize(rows, "Items retrieved successfully")
+
+
+def populate():
+    conn = sqlite3.connect(f"{workdir}/bench.db")
+    conn.execute("INSERT INTO user (id, username, email, password) VALUES (1, 'bench', 'bench@example.com', 'x')")
+    conn.executemany(
+        "INSERT INTO item (title, description, owner_id) VALUES (?, ?, 1)",
+        [(f"Item {index}", "lorem ipsum dolor sit amet " * 4) for index in range(ROWS)],
+    )
+    conn.commit()
+    conn.close()
+
+
+async def measure(page) -> tuple[float, float]:
+    offsets = [(index * PAGE) % (ROWS - PAGE) for index in range(ROUNDS)]
+    for offset in offsets[:20]:
+        await page(offset)
+
+    start = time.perf_counter()
+    for offset in offsets:
+        await page(offset)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    peak = 0
+    for offset in offsets[:50]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await page(offset)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return ROUNDS / elapsed, peak
+
+
+async def main():
+    await init_db()
+    populate()
+    assert await orm_page(0) == await core_page(0), "paths render different bodies"
+
+    print(f"{ROWS} items, {PAGE} rows per page, {ROUNDS} pages")
+    print(f"{'path':<8}{'pages/s':>10}{'us/page':>10}{'peak KiB':>10}")
+    for name, page in (("orm", orm_page), ("core", core_page)):
+        throughput, peak = await measure(page)
+        print(f"{name:<8}{throughput:>10.0f}{1e6 / throughput:>10.0f}{peak / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
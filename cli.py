@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+
+from core.backup import (
+    backup_database,
+    database_path,
+    database_paths,
+    restore_database,
+    shard_snapshot_path,
+)
+from core.config import settings
+from core.database import shard_router
+from core.importer import ItemImporter, detect_format
+from core.sharding import rebalance
+
+
+def backup(args: argparse.Namespace):
+    sources = database_paths()
+    output = args.output
+    if output is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = Path(settings.BACKUP_DIR) / (f"{sources[0].stem}-{stamp}.db" + (".gz" if args.compress else ""))
+    outputs = [output] + [shard_snapshot_path(output, index) for index in range(len(sources) - 1)]
+
+    for source, target in zip(sources, outputs):
+
+        def on_progress(done: int, total: int):
+            print(f"\rBacked up {done}/{total} pages of {source}", end="", flush=True)
+
+        backup_database(
+            source,
+            target,
+            compress=args.compress,
+            pages=args.pages,
+            throttle=args.throttle,
+            progress=on_progress,
+        )
+        print(f"\nSnapshot written to {target}")
+
+
+def restore(args: argparse.Namespace):
+    if shard_router is not None and args.target is not None:
+        raise SystemExit("--target cannot be used with SHARD_URLS, shards are restored into their configured files")
+    targets = [args.target or database_path()] + database_paths()[1:]
+    snapshots = [args.snapshot] + [shard_snapshot_path(args.snapshot, index) for index in range(len(targets) - 1)]
+    # check that every shard snapshot is there before overwriting anything
+    missing = [str(snapshot) for snapshot in snapshots if not snapshot.exists()]
+    if missing:
+        raise SystemExit(f"Snapshot not found: {', '.join(missing)}")
+
+    for snapshot, target in zip(snapshots, targets):
+        restore_database(snapshot, target)
+        print(f"Database {target} restored from {snapshot}")
+
+
+def shard(args: argparse.Namespace):
+    if shard_router is None:
+        raise SystemExit("SHARD_URLS is not configured")
+    source = args.source or database_path()
+    rebalance(source, shard_router, batch_size=args.batch_size)
+    print(f"Database {source} copied into {shard_router.count} shards")
+
+
+def import_items(args: argparse.Namespace):
+    import_format = args.format or detect_format(name=args.file.name)
+    if import_format is None:
+        raise SystemExit("Cannot tell the file format from its name, pass --format")
+    report = args.report or args.file.with_name(args.file.name + ".report.jsonl")
+
+    async def read_file():
+        with open(args.file, "rb") as file:
+            while chunk := file.read(1024 * 1024):
+                yield chunk
+
+    summary = asyncio.run(ItemImporter(report, args.chunk_size).run(read_file(), import_format))
+    print(f"Read {summary.read} records: {summary.imported} imported, {summary.rejected} rejected")
+    print(f"Report written to {report}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"{settings.APP_TITLE} administration commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup_parser = commands.add_parser("backup", help="Take an online snapshot of the database and of every shard")
+    backup_parser.add_argument("-o", "--output", type=Path, help="Snapshot path (defaults to BACKUP_DIR)")
+    backup_parser.add_argument("--no-compress", dest="compress", action="store_false", help="Do not gzip the snapshot")
+    backup_parser.add_argument("--pages", type=int, default=settings.BACKUP_PAGES_PER_STEP, help="Pages per step")
+    backup_parser.add_argument(
+        "--throttle", type=float, default=settings.BACKUP_STEP_SLEEP, help="Seconds between steps"
+    )
+    backup_parser.set_defaults(func=backup)
+
+    restore_parser = commands.add_parser("restore", help="Restore the database and every shard from a snapshot")
+    restore_parser.add_argument("snapshot", type=Path, help="Snapshot to restore, optionally gzipped")
+    restore_parser.add_argument("--target", type=Path, help="Database file to restore into (defaults to DATABASE_URL)")
+    restore_parser.set_defaults(func=restore)
+
+    shard_parser = commands.add_parser("shard", help="Copy a single database into the shards of SHARD_URLS")
+    shard_parser.add_argument("--source", type=Path, help="Database file to copy (defaults to DATABASE_URL)")
+    shard_parser.add_argument("--batch-size", type=int, default=10_000, help="Rows copied per statement")
+    shard_parser.set_defaults(func=shard)
+
+    import_parser = commands.add_parser("import", help="Import items from a CSV or NDJSON file")
+    import_parser.add_argument("file", type=Path, help="File to import, CSV with a header row or NDJSON")
+    import_parser.add_argument("--format", choices=["csv", "ndjson"], help="File format (defaults to the extension)")
+    import_parser.add_argument("--report", type=Path, help="Report of rejected rows (defaults to FILE.report.jsonl)")
+    import_parser.add_argument(
+        "--chunk-size", type=int, default=settings.IMPORT_CHUNK_SIZE, help="Rows inserted per transaction"
+    )
+    import_parser.set_defaults(func=import_items)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
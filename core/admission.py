@@ -0,0 +1,161 @@
+import math
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.logging import logger
+from core.response import StandardResponse
+
+from .config import settings
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+@dataclass
+class TokenBucket:
+    tokens: float
+    updated_at: float
+
+
+class RateLimiter:
+    """
+    Per-client token bucket rate limiter.
+
+    Each client gets ``burst`` tokens refilled at ``rate`` tokens per second. At most ``max_clients`` clients are
+    tracked, and a client is only forgotten once its bucket has refilled, so that eviction never hands out tokens.
+    While the table is full of clients still refilling, new clients share a single overflow bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._overflow = TokenBucket(tokens=burst, updated_at=time.monotonic())
+
+    def acquire(self, client: str) -> float:
+        """
+        Take a token for a client.
+
+        Args:
+            client (str): The client key, an API key or an IP address.
+        Returns:
+            float: 0 if the request is allowed, otherwise the number of seconds until a token is available.
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        bucket = self._bucket(client, now)
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate)
+        bucket.updated_at = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / self.rate
+
+    def _bucket(self, client: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is not None:
+            self._buckets.move_to_end(client)
+            return bucket
+        while len(self._buckets) >= self.max_clients:
+            oldest = next(iter(self._buckets.values()))
+            if oldest.tokens + (now - oldest.updated_at) * self.rate < self.burst:
+                return self._overflow
+            self._buckets.popitem(last=False)
+        bucket = self._buckets[client] = TokenBucket(tokens=self.burst, updated_at=now)
+        return bucket
+
+
+class PoolMonitor:
+    """Exponentially weighted moving average of the time spent waiting for a database connection."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.wait = 0.0
+
+    def record(self, seconds: float):
+        self.wait += self.alpha * (seconds - self.wait)
+
+    def saturated(self) -> bool:
+        return self.wait > settings.ADMISSION_MAX_POOL_WAIT
+
+
+rate_limiter = RateLimiter(settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST, settings.RATE_LIMIT_MAX_CLIENTS)
+pool_monitor = PoolMonitor()
+
+
+def client_key(scope: Scope) -> str:
+    """
+    Identify the client of a request for rate limiting.
+
+    Args:
+        scope (Scope): The request scope.
+    Returns:
+        str: The API key if it is one of ``API_KEYS`` or the admin key, otherwise the client address. Unknown keys
+            are ignored so that a client cannot get a fresh bucket by changing the header.
+    """
+    api_key = Headers(scope=scope).get("x-api-key")
+    known = [*settings.API_KEYS, *([settings.ADMIN_API_KEY] if settings.ADMIN_API_KEY else [])]
+    if api_key and any(secrets.compare_digest(api_key.encode(), key.encode()) for key in known):
+        return f"key:{api_key}"
+    return f"addr:{scope['client'][0] if scope.get('client') else ''}"
+
+
+def _reject(status_code: int, message: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content=StandardResponse(status="error", data={}, message=message).model_dump(),
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionControlMiddleware:
+    """
+    Shed load early instead of queueing requests behind a slow database.
+
+    Requests are rate limited per client (a known ``X-API-Key``, falling back to the client IP) and rejected with
+    429 when the client's bucket is empty. Requests are then split into reads and writes; when a class already
+    has its maximum number of requests in flight, or the database pool wait time is above its limit while other
+    requests of the class are still running, the request is rejected with 503 and ``Retry-After``.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter = rate_limiter, monitor: PoolMonitor = pool_monitor):
+        self.app = app
+        self.limiter = limiter
+        self.monitor = monitor
+        self.inflight = {"read": 0, "write": 0}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(tuple(settings.ADMISSION_EXEMPT_PATHS)):
+            await self.app(scope, receive, send)
+            return
+
+        client = client_key(scope)
+        retry_after = self.limiter.acquire(client)
+        if retry_after:
+            logger.warning(f"Rate limit exceeded for client: {client}")
+            await _reject(429, "Too many requests", retry_after)(scope, receive, send)
+            return
+
+        route_class = "read" if scope["method"] in READ_METHODS else "write"
+        limit = (
+            settings.ADMISSION_MAX_INFLIGHT_READS if route_class == "read" else settings.ADMISSION_MAX_INFLIGHT_WRITES
+        )
+        inflight = self.inflight[route_class]
+        if inflight >= limit or (inflight and self.monitor.saturated()):
+            logger.warning(f"Shedding {route_class} request: {inflight} in flight, pool wait {self.monitor.wait:.3f}s")
+            await _reject(503, "Service overloaded", settings.ADMISSION_RETRY_AFTER)(scope, receive, send)
+            return
+
+        self.inflight[route_class] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight[route_class] -= 1
@@ -0,0 +1,249 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+from pydantic import BaseModel
+from sqlalchemy.engine import make_url
+
+from core.logging import logger
+
+from .config import settings
+from .database import shard_router
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class BackupStatus(BaseModel):
+    id: str
+    path: str
+    compress: bool
+    shard_paths: list[str] = []
+    status: str = "pending"
+    pages_done: int = 0
+    pages_total: int = 0
+    error: str | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+def database_path() -> Path:
+    """Return the path of the SQLite database file configured in ``DATABASE_URL``."""
+    return Path(make_url(settings.DATABASE_URL).database)
+
+
+def database_paths() -> list[Path]:
+    """Return the path of the configured database followed by the path of every shard in ``SHARD_URLS``."""
+    return [database_path()] + (shard_router.paths() if shard_router is not None else [])
+
+
+def shard_snapshot_path(snapshot: Path, index: int) -> Path:
+    """
+    Return the path of a shard snapshot taken alongside a snapshot of the main database.
+
+    Args:
+        snapshot (Path): The snapshot of the main database, e.g. ``backups/app.db.gz``.
+        index (int): The position of the shard in ``SHARD_URLS``.
+    Returns:
+        Path: The shard snapshot, e.g. ``backups/app.shard0.db.gz``.
+    """
+    name, suffix = snapshot.name, ""
+    for extension in (".gz", ".db"):
+        if name.endswith(extension):
+            name, suffix = name[: -len(extension)], extension + suffix
+    return snapshot.with_name(f"{name}.shard{index}{suffix}")
+
+
+def backup_database(
+    source: Path,
+    target: Path,
+    compress: bool = True,
+    pages: int = 256,
+    throttle: float = 0.0,
+    progress: ProgressCallback | None = None,
+) -> Path:
+    """
+    Copy a live SQLite database with the online backup API.
+
+    The copy runs ``pages`` pages at a time. The source is only locked while a step runs, and the thread sleeps
+    ``throttle`` seconds between steps so that writers keep making progress. Note that SQLite restarts the copy
+    if the source is written through another connection, so heavy write traffic can delay completion.
+
+    Args:
+        source (Path): The database to copy.
+        target (Path): The snapshot file to write. It is written to a temporary file and renamed when complete.
+        compress (bool, optional): Whether to gzip the snapshot. Defaults to True.
+        pages (int, optional): The number of pages copied per step. Defaults to 256.
+        throttle (float, optional): The number of seconds to sleep between steps. Defaults to 0.
+        progress (ProgressCallback, optional): Called with ``(pages_done, pages_total)`` after every step.
+    Returns:
+        Path: The snapshot path.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(target.name + ".part")
+    copy = partial.with_name(partial.name + ".db") if compress else partial
+
+    def on_step(status: int, remaining: int, total: int):
+        if progress is not None:
+            progress(total - remaining, total)
+        if throttle and remaining:
+            time.sleep(throttle)
+
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst = sqlite3.connect(copy)
+    try:
+        src.backup(dst, pages=pages, progress=on_step)
+    finally:
+        dst.close()
+        src.close()
+
+    if compress:
+        with open(copy, "rb") as plain, gzip.open(
+            partial, "wb", compresslevel=settings.BACKUP_COMPRESS_LEVEL
+        ) as packed:
+            shutil.copyfileobj(plain, packed)
+        copy.unlink()
+    os.replace(partial, target)
+    return target
+
+
+def validate_snapshot(path: Path):
+    """
+    Check that a snapshot is a consistent database containing the application tables.
+
+    Args:
+        path (Path): The uncompressed snapshot to check.
+    Raises:
+        ValueError: If the snapshot is corrupt or is not a database of this application.
+    """
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"Invalid snapshot {path}: {e}") from e
+    if result != "ok":
+        raise ValueError(f"Snapshot {path} failed integrity check: {result}")
+    missing = {"user", "item"} - tables
+    if missing:
+        raise ValueError(f"Snapshot {path} is missing tables: {', '.join(sorted(missing))}")
+
+
+def restore_database(snapshot: Path, target: Path, pages: int = -1) -> Path:
+    """
+    Restore a snapshot into a database file.
+
+    The snapshot is decompressed if needed and validated before anything is written. It is then copied into the
+    target with the online backup API, so connections that are open on the target see either the old or the new
+    database, never a torn copy.
+
+    Args:
+        snapshot (Path): The snapshot to restore, optionally gzipped.
+        target (Path): The database file to overwrite.
+        pages (int, optional): The number of pages copied per step. Defaults to -1 (all at once).
+    Returns:
+        Path: The restored database path.
+    Raises:
+        ValueError: If the snapshot is invalid.
+    """
+    with tempfile.TemporaryDirectory(dir=target.parent) as workdir:
+        plain = snapshot
+        if snapshot.suffix == ".gz":
+            plain = Path(workdir) / "snapshot.db"
+            with gzip.open(snapshot, "rb") as packed, open(plain, "wb") as out:
+                shutil.copyfileobj(packed, out)
+        validate_snapshot(plain)
+
+        src = sqlite3.connect(f"file:{plain}?mode=ro", uri=True)
+        dst = sqlite3.connect(target)
+        try:
+            src.backup(dst, pages=pages)
+        finally:
+            dst.close()
+            src.close()
+    logger.info(f"Database {target} restored from {snapshot}")
+    return target
+
+
+class BackupManager:
+    """Run backups on background threads and keep the status of the most recent ones."""
+
+    def __init__(self, history: int):
+        self.history = history
+        self._backups: OrderedDict[str, BackupStatus] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, compress: bool = True) -> BackupStatus:
+        """
+        Start a backup of the configured database and of every shard.
+
+        Args:
+            compress (bool, optional): Whether to gzip the snapshot. Defaults to True.
+        Returns:
+            BackupStatus: The status of the new backup, updated in place while it runs.
+        """
+        backup_id = uuid.uuid4().hex
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        suffix = ".gz" if compress else ""
+        path = Path(settings.BACKUP_DIR) / f"{database_path().stem}-{stamp}-{backup_id[:8]}.db{suffix}"
+        status = BackupStatus(
+            id=backup_id,
+            path=str(path),
+            shard_paths=[str(shard_snapshot_path(path, index)) for index in range(len(database_paths()) - 1)],
+            compress=compress,
+        )
+        with self._lock:
+            self._backups[backup_id] = status
+            while len(self._backups) > self.history:
+                self._backups.popitem(last=False)
+        threading.Thread(target=self._run, args=(status,), name=f"backup-{backup_id[:8]}", daemon=True).start()
+        return status
+
+    def get(self, backup_id: str) -> BackupStatus | None:
+        with self._lock:
+            return self._backups.get(backup_id)
+
+    @staticmethod
+    def _run(status: BackupStatus):
+        sources = database_paths()
+        targets = [Path(status.path)] + [Path(path) for path in status.shard_paths]
+        copied = 0
+
+        def on_progress(done: int, total: int):
+            status.pages_done, status.pages_total = copied + done, copied + total
+
+        status.status = "running"
+        status.started_at = datetime.now(timezone.utc)
+        try:
+            for source, target in zip(sources, targets):
+                backup_database(
+                    source,
+                    target,
+                    compress=status.compress,
+                    pages=settings.BACKUP_PAGES_PER_STEP,
+                    throttle=settings.BACKUP_STEP_SLEEP,
+                    progress=on_progress,
+                )
+                copied = status.pages_total
+            status.status = "completed"
+            logger.info(f"Backup completed: {status.path}")
+        except (sqlite3.Error, OSError) as e:
+            status.status = "failed"
+            status.error = str(e)
+            logger.error(f"Backup failed: {e}")
+        finally:
+            status.finished_at = datetime.now(timezone.utc)
+
+
+backup_manager = BackupManager(settings.BACKUP_HISTORY)
@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import math
+import time
+
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlmodel import select
+
+from core.logging import logger
+from models import Change, User, UserPublic
+
+from .config import settings
+from .database import engine, shard_router, uninterruptible
+
+
+class CountingBloomFilter:
+    """
+    A Bloom filter with 8-bit counters instead of bits, so that values can be removed.
+
+    ``might_contain`` never returns False for a value that was added and not removed. Counters that reach 255
+    stay there, so an overflow can only cause false positives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._counters = bytearray(self.size)
+
+    def _positions(self, value: str) -> list[int]:
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            if self._counters[position] < 255:
+                self._counters[position] += 1
+        self.count += 1
+
+    def remove(self, value: str):
+        """Remove a value. Only values that were added may be removed, otherwise members can be lost."""
+        for position in self._positions(value):
+            if 0 < self._counters[position] < 255:
+                self._counters[position] -= 1
+        self.count = max(0, self.count - 1)
+
+    def might_contain(self, value: str) -> bool:
+        return all(self._counters[position] for position in self._positions(value))
+
+    def false_positive_rate(self) -> float:
+        """Estimate the false positive rate at the current number of values."""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+    def memory_bytes(self) -> int:
+        return len(self._counters)
+
+
+class FilterStats(BaseModel):
+    ready: bool
+    values: int
+    capacity: int
+    hash_count: int
+    memory_bytes: int
+    false_positive_rate: float
+
+
+class UserExistenceFilter:
+    """
+    In-memory filters of the usernames and emails of live users.
+
+    A negative answer means that no live user has the value, so existence checks can skip the database. A
+    positive answer may be a false positive and must be confirmed with a query. Until ``build`` completes every
+    value is reported as possibly present.
+
+    The filters follow the user entries of the change log, which every worker writes to: ``sync`` adds the values
+    of created and updated users. It runs after local writes and every ``sync_interval`` seconds in the
+    background, so users written by other workers can be missed for that long, and checks that must see every
+    commit have to query the database. Removals are applied by the worker that changed or deleted the user, so
+    values removed elsewhere remain as false positives until the next ``build``.
+    """
+
+    fields = ("username", "email")
+
+    def __init__(self, capacity: int, error_rate: float, sync_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.ready = False
+        self._filters = self._new_filters(capacity)
+        self._positions: list[int] = []
+        self._synced_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def sources(self) -> list[AsyncEngine]:
+        return list(shard_router.engines.values()) if shard_router is not None else [engine]
+
+    def _new_filters(self, capacity: int) -> dict[str, CountingBloomFilter]:
+        return {field: CountingBloomFilter(capacity, self.error_rate) for field in self.fields}
+
+    async def start(self):
+        """Build the filters, then keep them in sync with the change log in the background."""
+        await self.build()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except SQLAlchemyError as e:
+                logger.error(f"Failed to sync user filters: {e}")
+
+    async def build(self):
+        """Build the filters with a streaming scan of the live users of every database."""
+        # build runs at startup, on the loop that the filters are used from
+        self._lock = asyncio.Lock()
+        async with self._lock:
+            await self._build()
+
+    @uninterruptible
+    async def _build(self):
+        live = select(User.username, User.email).where(User.deleted_at.is_(None))
+        counts, positions = [], []
+        for db_engine in self.sources:
+            async with AsyncSession(db_engine) as session:
+                # changes after this position are replayed by the next sync, users seen twice only add false positives
+                positions.append(await session.scalar(select(func.max(Change.id))) or 0)
+                counts.append(await session.scalar(select(func.count()).select_from(live.subquery())))
+        building = self._new_filters(max(self.capacity, 2 * sum(counts)))
+
+        for db_engine in self.sources:
+            async with AsyncSession(db_engine) as session:
+                rows = await session.stream(live.execution_options(yield_per=settings.USER_FILTER_SCAN_BATCH))
+                async for username, email in rows:
+                    building["username"].add(username)
+                    building["email"].add(email)
+        self._filters, self._positions, self._synced_at = building, positions, time.monotonic()
+        self.ready = True
+        logger.info(f"User filters built with {self._filters['username'].count} users")
+
+    async def sync(self):
+        """Add the values of the users created or updated since the last sync, by any worker."""
+        if not self.ready:
+            return
+        async with self._lock:
+            await self._sync()
+
+    @uninterruptible
+    async def _sync(self):
+        if time.monotonic() - self._synced_at > settings.CHANGE_FEED_RETENTION / 2:
+            # the change log may have been purged past the last position
+            await self._build()
+            return
+        synced_at = time.monotonic()
+        for source, db_engine in enumerate(self.sources):
+            query = (
+                select(Change.id, Change.data)
+                .where(
+                    Change.entity == "user", Change.id > self._positions[source], Change.op.in_(("create", "update"))
+                )
+                .order_by(Change.id)
+            )
+            async with AsyncSession(db_engine) as session:
+                rows = await session.stream(query.execution_options(yield_per=settings.USER_FILTER_SCAN_BATCH))
+                async for change_id, data in rows:
+                    for field in self.fields:
+                        self._filters[field].add(data[field])
+                    self._positions[source] = change_id
+        self._synced_at = synced_at
+
+    async def remove(self, users: list[User | UserPublic]):
+        """
+        Remove the values of users that were changed or deleted by this worker.
+
+        The change log is synced first, so that every removed value was added before.
+        """
+        if not self.ready:
+            return
+        async with self._lock:
+            await self._sync()
+            for user in users:
+                for field in self.fields:
+                    self._filters[field].remove(getattr(user, field))
+
+    def might_exist(self, field: str, value: str) -> bool:
+        return not self.ready or self._filters[field].might_contain(value)
+
+    def stats(self) -> dict[str, FilterStats]:
+        return {
+            field: FilterStats(
+                ready=self.ready,
+                values=bloom.count,
+                capacity=bloom.capacity,
+                hash_count=bloom.hash_count,
+                memory_bytes=bloom.memory_bytes(),
+                false_positive_rate=bloom.false_positive_rate(),
+            )
+            for field, bloom in self._filters.items()
+        }
+
+
+user_filter = UserExistenceFilter(
+    settings.USER_FILTER_CAPACITY, settings.USER_FILTER_ERROR_RATE, settings.USER_FILTER_SYNC_INTERVAL
+)
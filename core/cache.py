@@ -0,0 +1,342 @@
+import asyncio
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlmodel import SQLModel, select
+
+from core.logging import logger
+from models import Item, ItemPublic, User, UserPublic
+
+from .changefeed import change_broadcaster, parse_cursor
+from .config import settings
+from .database import create_session, uninterruptible
+from .fastpath import ListQuery, item_listing, user_listing
+
+
+@dataclass
+class CachedPage:
+    rows: list[tuple]
+    body: bytes
+    after_id: int | None
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def covers(self, entity_id: int, limit: int, key_index: int) -> bool:
+        """Whether inserting or removing ``entity_id`` shifts the rows of this page."""
+        return len(self.rows) < limit or entity_id <= self.rows[-1][key_index]
+
+
+class EntityCache:
+    """
+    The cached first pages of the listing and the most read records of one entity.
+
+    Pages hold the rows and the serialized body of ``GET /<entity>s/`` for ``page_size`` rows at offsets below
+    ``pages * page_size``, and can also be reached with the ``after_id`` of the previous page. Records hold the
+    public model of the IDs read most often, counted by ``get``.
+    """
+
+    def __init__(
+        self,
+        model: type[SQLModel],
+        public: type[SQLModel],
+        listing: ListQuery,
+        message: str,
+        pages: int,
+        page_size: int,
+    ):
+        self.model = model
+        self.public = public
+        self.listing = listing
+        self.key = listing.key_index
+        self.message = message
+        self.pages = pages
+        self.page_size = page_size
+        self.cached_pages: dict[int, CachedPage] = {}
+        self.records: dict[int, SQLModel] = {}
+        self.reads: Counter[int] = Counter()
+        self.generation = 0
+
+    def page(self, offset: int, limit: int, after_id: int | None) -> bytes | None:
+        """Return the cached body of a listing request, or None on a miss."""
+        if limit != self.page_size:
+            return None
+        if after_id is None:
+            page = self.cached_pages.get(offset)
+        else:
+            page = next((page for page in self.cached_pages.values() if page.rows and page.after_id == after_id), None)
+        return page.body if page is not None else None
+
+    def get(self, entity_id: int) -> SQLModel | None:
+        """Count a read of a record and return it if it is cached."""
+        self.reads[entity_id] += 1
+        if len(self.reads) > settings.CACHE_READS_MAX_KEYS:
+            self.decay()
+        return self.records.get(entity_id)
+
+    def decay(self):
+        """Halve the read counts, so that the hot set follows recent reads."""
+        self.reads = Counter({entity_id: count // 2 for entity_id, count in self.reads.items() if count > 1})
+
+    def hot_ids(self, count: int) -> list[int]:
+        return [entity_id for entity_id, _ in self.reads.most_common(count)]
+
+    def apply(self, op: str, entity_id: int, data: dict | None):
+        """
+        Bring the cache up to date with a committed change.
+
+        Updates are patched into the cached pages and records. Creates and deletes drop the pages whose rows they
+        shift, which the refresher then reloads, and deletes drop the record.
+        """
+        self.generation += 1
+        if op == "update" and data is not None:
+            if entity_id in self.records:
+                self.records[entity_id] = self.public.model_validate(data)
+            row = tuple(data[name] for name in self.listing.fields)
+            for page in self.cached_pages.values():
+                if not page.rows or not page.rows[0][self.key] <= entity_id <= page.rows[-1][self.key]:
+                    continue
+                for index, cached_row in enumerate(page.rows):
+                    if cached_row[self.key] == entity_id:
+                        page.rows[index] = row
+                        page.body = self.listing.serialize(page.rows, self.message)
+            return
+        if op == "delete":
+            self.records.pop(entity_id, None)
+        for offset, page in list(self.cached_pages.items()):
+            if page.covers(entity_id, self.page_size, self.key):
+                del self.cached_pages[offset]
+
+    @uninterruptible
+    async def load_page(self, offset: int):
+        generation = self.generation
+        async with create_session() as session:
+            if offset == 0:
+                rows, after_id = await self.listing.fetch(session, 0, self.page_size), None
+            else:
+                # one row before the page gives the after_id that keyset requests send for it
+                rows = await self.listing.fetch(session, offset - 1, self.page_size + 1)
+                after_id = rows[0][self.key] if rows else None
+                rows = rows[1:]
+        if generation == self.generation:
+            rows = [tuple(row) for row in rows]
+            self.cached_pages[offset] = CachedPage(rows, self.listing.serialize(rows, self.message), after_id)
+
+    @uninterruptible
+    async def load_records(self, entity_ids: list[int]):
+        """
+        Replace the cached records with the live records among ``entity_ids``.
+
+        Records that are missing or deleted, including by other workers, are dropped. If a change was applied
+        while loading, the loaded records may be stale, so only the live ones that were already cached are kept.
+        """
+        generation = self.generation
+        records = {}
+        if entity_ids:
+            async with create_session() as session:
+                result = await session.execute(
+                    select(self.model).where(self.model.id.in_(entity_ids), self.model.deleted_at.is_(None))
+                )
+                records = {record.id: self.public.model_validate(record) for record in result.scalars()}
+        if generation != self.generation:
+            records = {entity_id: self.records[entity_id] for entity_id in records if entity_id in self.records}
+        self.records = records
+
+    async def refresh(self, hot_ids: int | None = None):
+        """
+        Reload the pages that are missing or older than ``CACHE_TTL``, and if ``hot_ids`` is given, replace the
+        cached records with the ``hot_ids`` most read IDs.
+        """
+        now = time.monotonic()
+        for offset in range(0, self.pages * self.page_size, self.page_size):
+            page = self.cached_pages.get(offset)
+            if page is None or now - page.loaded_at > settings.CACHE_TTL:
+                await self.load_page(offset)
+        if hot_ids is None:
+            return
+        await self.load_records(self.hot_ids(hot_ids))
+
+
+class ReadCache:
+    """
+    An in-process cache of the hottest reads of ``/items/`` and ``/users/``.
+
+    ``start`` warms the cache in the background: the first ``CACHE_WARM_PAGES`` pages of each listing, and the
+    records read most often before the last shutdown, saved in ``CACHE_READS_FILE``. ``ready`` stays False until
+    then. Committed writes are applied as they happen (see ``record_change``): updates are patched in place, and
+    creates and deletes only drop the pages they shift, which are reloaded shortly after. Writes from other
+    workers are applied the same way as they reach the change log, through the change broadcaster; the echoes of
+    local writes are skipped, so that an older local change is not applied again over a newer one. Every
+    ``CACHE_TTL`` seconds, stale pages are reloaded and the cached records follow the most read IDs.
+    """
+
+    def __init__(self, pages: int, page_size: int, hot_ids: int):
+        self.hot_ids = hot_ids
+        self.entities = {
+            "item": EntityCache(Item, ItemPublic, item_listing, "Items retrieved successfully", pages, page_size),
+            "user": EntityCache(User, UserPublic, user_listing, "Users retrieved successfully", pages, page_size),
+        }
+        self.ready = False
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._follower: asyncio.Task | None = None
+        self._echoes: Counter[tuple] = Counter()
+
+    @property
+    def items(self) -> EntityCache:
+        return self.entities["item"]
+
+    @property
+    def users(self) -> EntityCache:
+        return self.entities["user"]
+
+    async def start(self):
+        self.load_reads()
+        self._wakeup = asyncio.Event()
+        self._echoes.clear()
+        self._task = asyncio.create_task(self._run())
+        self._follower = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        for task in (self._follower, self._task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = self._follower = None
+        self.save_reads()
+        self.ready = False
+        # without the refresher, entries would no longer follow writes from other workers
+        for cache in self.entities.values():
+            cache.cached_pages.clear()
+            cache.records.clear()
+
+    async def warm(self):
+        """Load the hot pages and the most read records."""
+        for cache in self.entities.values():
+            await cache.refresh(self.hot_ids)
+        self.ready = True
+        logger.info(
+            "Read cache warmed with "
+            + ", ".join(
+                f"{len(cache.cached_pages)} {entity} pages and {len(cache.records)} {entity}s"
+                for entity, cache in self.entities.items()
+            )
+        )
+
+    def apply(self, changes: list[tuple[str, str, int, dict | None]]):
+        """Apply changes committed by this worker and wake the refresher to reload the pages they dropped."""
+        if self._follower is not None:
+            if len(self._echoes) > change_broadcaster.queue_size:
+                # the follower is far behind and resynchronises from the log, replaying these changes anyway
+                self._echoes.clear()
+            self._echoes.update(self._echo_key(*change) for change in changes)
+        self._apply(changes)
+
+    @staticmethod
+    def _echo_key(entity: str, op: str, entity_id: int, data: dict | None) -> tuple:
+        return entity, op, entity_id, json.dumps(data, sort_keys=True)
+
+    def _apply(self, changes: list[tuple[str, str, int, dict | None]]):
+        for entity, op, entity_id, data in changes:
+            if entity in self.entities:
+                self.entities[entity].apply(op, entity_id, data)
+        if self._task is None:
+            return
+        loop = self._task.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wakeup.set()
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def load_reads(self):
+        path = Path(settings.CACHE_READS_FILE)
+        if not path.exists():
+            return
+        try:
+            saved = json.loads(path.read_text())
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable cache read counts in {path}: {e}")
+            return
+        for entity, reads in saved.items():
+            if entity in self.entities:
+                self.entities[entity].reads.update({int(entity_id): count for entity_id, count in reads.items()})
+
+    def save_reads(self):
+        reads = {entity: dict(cache.reads.most_common(self.hot_ids)) for entity, cache in self.entities.items()}
+        path = Path(settings.CACHE_READS_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(reads))
+
+    async def _follow(self):
+        after = None
+        while True:
+            try:
+                async for changes, cursor in change_broadcaster.listen(None, after, settings.CACHE_TTL):
+                    after = parse_cursor(cursor, len(change_broadcaster.sources))
+                    remote = []
+                    for change in changes:
+                        key = self._echo_key(change.entity, change.op, change.entity_id, change.data)
+                        if self._echoes[key] > 0:
+                            self._echoes[key] -= 1
+                            if not self._echoes[key]:
+                                del self._echoes[key]
+                        else:
+                            remote.append((change.entity, change.op, change.entity_id, change.data))
+                    if remote:
+                        self._apply(remote)
+                return
+            except SQLAlchemyError as e:
+                logger.error(f"Failed to follow change log: {e}")
+                await asyncio.sleep(settings.CACHE_TTL)
+
+    async def _run(self):
+        while not self.ready:
+            try:
+                await self.warm()
+            except SQLAlchemyError as e:
+                logger.error(f"Failed to warm read cache: {e}")
+                await asyncio.sleep(settings.CACHE_TTL)
+        rotated = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.CACHE_TTL)
+                # let a burst of writes settle before reloading
+                await asyncio.sleep(settings.CACHE_REFRESH_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            rotate = time.monotonic() - rotated >= settings.CACHE_TTL
+            try:
+                for cache in self.entities.values():
+                    await cache.refresh(self.hot_ids if rotate else None)
+                    if rotate:
+                        cache.decay()
+            except SQLAlchemyError as e:
+                logger.error(f"Failed to refresh read cache: {e}")
+                continue
+            if rotate:
+                rotated = time.monotonic()
+                self.save_reads()
+
+
+read_cache = ReadCache(settings.CACHE_WARM_PAGES, settings.CACHE_PAGE_SIZE, settings.CACHE_HOT_IDS)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_changes(session: Session):
+    changes = session.info.pop("changes", None)
+    if changes:
+        read_cache.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session):
+    session.info.pop("changes", None)
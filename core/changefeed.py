@@ -0,0 +1,336 @@
+import asyncio
+import contextvars
+import json
+from typing import AsyncIterator
+
+from fastapi import Request
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlmodel import SQLModel, select
+
+from core.exceptions import CursorTooOldError, InvalidCursorError
+from core.logging import logger
+from models import Change, ChangePublic
+
+from .config import settings
+from .database import engine, shard_router, uninterruptible
+
+_RESYNC = object()
+_CLOSED = object()
+
+
+def record_change(session: AsyncSession, entity: str, op: str, entity_id: int, data: SQLModel | dict | None = None):
+    """
+    Append a change to the change log as part of the session's current transaction.
+
+    The change is also kept in ``session.info["changes"]`` until the transaction ends, so that the read cache can
+    apply it once it is committed.
+
+    Args:
+        session (AsyncSession): The session performing the write.
+        entity (str): The changed entity, e.g. ``"item"`` or ``"user"``.
+        op (str): The operation, one of ``"create"``, ``"update"`` or ``"delete"``.
+        entity_id (int): The ID of the changed row.
+        data (SQLModel | dict | None, optional): The public representation of the row after the change.
+    """
+    if isinstance(data, SQLModel):
+        data = data.model_dump(mode="json")
+    session.add(Change(entity=entity, op=op, entity_id=entity_id, data=data))
+    session.info.setdefault("changes", []).append((entity, op, entity_id, data))
+
+
+def parse_cursor(cursor: str | None, sources: int) -> list[int] | None:
+    """
+    Parse a change feed position sent as ``Last-Event-ID``.
+
+    A position is the last change ID seen on every change log source (one per shard), joined with dots.
+
+    Args:
+        cursor (str | None): The position sent by the client.
+        sources (int): The number of change log sources.
+    Returns:
+        list[int] | None: The last change ID per source, or None if no position was sent.
+    Raises:
+        InvalidCursorError: If the position is malformed.
+    """
+    if cursor is None:
+        return None
+    try:
+        positions = [int(part) for part in cursor.split(".")]
+    except ValueError:
+        raise InvalidCursorError(cursor)
+    if len(positions) != sources:
+        raise InvalidCursorError(cursor)
+    return positions
+
+
+def format_cursor(positions: list[int]) -> str:
+    return ".".join(str(position) for position in positions)
+
+
+class ChangeBroadcaster:
+    """
+    Fan out change log entries to in-process subscribers.
+
+    A single poller task reads new entries from the change log and pushes them to every subscriber queue, so N
+    subscribers cost one log read. The poller is woken by ``notify()`` after local commits and falls back to
+    polling every ``poll_interval`` seconds to pick up writes from other workers. Subscribers that fall too far
+    behind are asked to resynchronise from the log instead of growing their queue without bound.
+
+    When the database is sharded every shard has its own change log, and feed positions hold one change ID per
+    shard.
+    """
+
+    def __init__(self, poll_interval: float, batch_size: int, queue_size: int):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._subscribers: set[asyncio.Queue] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._last_ids: list[int] | None = None
+
+    @property
+    def sources(self) -> list[AsyncEngine]:
+        return list(shard_router.engines.values()) if shard_router is not None else [engine]
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._subscribers = set()
+            self._wakeup = asyncio.Event()
+            self._task = None
+            self._last_ids = None
+
+    def notify(self):
+        """Wake the poller after a local commit to the change log."""
+        if self._loop is asyncio.get_running_loop():
+            self._wakeup.set()
+
+    @uninterruptible
+    async def _read(self, source: int, after: int, until: int | None = None, entity: str | None = None) -> list[Change]:
+        query = select(Change).where(Change.id > after).order_by(Change.id).limit(self.batch_size)
+        if until is not None:
+            query = query.where(Change.id <= until)
+        if entity is not None:
+            query = query.where(Change.entity == entity)
+        async with AsyncSession(self.sources[source]) as session:
+            result = await session.execute(query)
+            return list(result.scalars().all())
+
+    @uninterruptible
+    async def check_retained(self, positions: list[int]):
+        """
+        Check that the changes following a feed position are still in the change log.
+
+        Args:
+            positions (list[int]): The last change ID seen per source.
+        Raises:
+            CursorTooOldError: If changes after the position were purged; the client has to resynchronise.
+        """
+        for source, position in zip(self.sources, positions):
+            async with AsyncSession(source) as session:
+                oldest = (await session.execute(select(func.min(Change.id)))).scalar()
+            # change IDs have no gaps, so the position is still covered if it is at most one below the oldest change
+            if oldest is not None and position < oldest - 1:
+                raise CursorTooOldError(format_cursor(positions))
+
+    @uninterruptible
+    async def _head(self) -> list[int]:
+        if self._last_ids is not None:
+            return list(self._last_ids)
+        heads = []
+        for source in self.sources:
+            async with AsyncSession(source) as session:
+                result = await session.execute(select(func.max(Change.id)))
+                heads.append(result.scalar() or 0)
+        return heads
+
+    def _publish(self, event: object):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(_CLOSED if event is _CLOSED else _RESYNC)
+
+    async def _run(self):
+        self._last_ids = await self._head()
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                for source in range(len(self._last_ids)):
+                    while True:
+                        changes = await self._read(source, self._last_ids[source])
+                        for change in changes:
+                            self._publish((source, ChangePublic.model_validate(change)))
+                        if changes:
+                            self._last_ids[source] = changes[-1].id
+                        if len(changes) < self.batch_size:
+                            break
+            except Exception as e:
+                logger.error(f"Failed to read change log: {e}")
+        self._task = None
+        self._last_ids = None
+
+    def _ensure_running(self):
+        if self._task is None:
+            # the poller outlives the request that starts it and must not inherit its deadline
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def listen(
+        self, entity: str | None, after: list[int] | None, timeout: float
+    ) -> AsyncIterator[tuple[list[ChangePublic], str]]:
+        """
+        Yield batches of changes for an entity, starting after the given feed position.
+
+        Changes already in the log are replayed first, then live changes follow. An empty batch means that
+        ``timeout`` seconds passed without any change. Every change carries the feed position following it in
+        ``cursor``, and every batch comes with the feed position after it, which also moves past the changes of
+        other entities so that idle clients keep a position that is not purged.
+
+        Args:
+            entity (str | None): The entity to listen to, or None for the changes of every entity.
+            after (list[int] | None): The last change ID seen per source, or None to start from now.
+            timeout (float): The number of seconds to wait before yielding an empty batch.
+        Yields:
+            tuple[list[ChangePublic], str]: The next batch of changes and the feed position after it.
+        """
+        self._bind_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        self._ensure_running()
+
+        def advance(source: int, change: ChangePublic) -> ChangePublic:
+            cursor[source] = change.id
+            return change.model_copy(update={"cursor": format_cursor(cursor)})
+
+        try:
+            head = await self._head()
+            cursor = list(head if after is None else after)
+            resync = True
+            while True:
+                if resync:
+                    for source in range(len(cursor)):
+                        while cursor[source] < head[source]:
+                            changes = await self._read(source, cursor[source], head[source], entity)
+                            batch = [advance(source, ChangePublic.model_validate(change)) for change in changes]
+                            if len(changes) < self.batch_size:
+                                cursor[source] = head[source]
+                            if batch:
+                                yield batch, format_cursor(cursor)
+                    resync = False
+
+                try:
+                    events = [await asyncio.wait_for(queue.get(), timeout)]
+                except asyncio.TimeoutError:
+                    yield [], format_cursor(cursor)
+                    continue
+                while not queue.empty():
+                    events.append(queue.get_nowait())
+
+                if _CLOSED in events:
+                    return
+                if _RESYNC in events:
+                    head = await self._head()
+                    resync = True
+                    continue
+                batch = []
+                for source, change in events:
+                    if change.id <= cursor[source]:
+                        continue
+                    if entity is None or change.entity == entity:
+                        batch.append(advance(source, change))
+                    else:
+                        cursor[source] = change.id
+                if batch:
+                    yield batch, format_cursor(cursor)
+        finally:
+            self._subscribers.discard(queue)
+
+    async def close(self):
+        """Disconnect all subscribers and stop the poller."""
+        self._publish(_CLOSED)
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            if self._loop is asyncio.get_running_loop():
+                # let the poller close its connection, an open read would keep the database locked
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._last_ids = None
+
+
+change_broadcaster = ChangeBroadcaster(
+    settings.CHANGE_FEED_POLL_INTERVAL,
+    settings.CHANGE_FEED_BATCH_SIZE,
+    settings.CHANGE_FEED_QUEUE_SIZE,
+)
+
+
+async def resume_position(cursor: str | None) -> list[int] | None:
+    """
+    Validate the ``Last-Event-ID`` sent by a client before any change is read.
+
+    Args:
+        cursor (str | None): The last feed position seen by the client.
+    Returns:
+        list[int] | None: The last change ID seen per source, or None if no position was sent.
+    Raises:
+        InvalidCursorError: If the position is malformed.
+        CursorTooOldError: If changes after the position were already purged from the change log.
+    """
+    positions = parse_cursor(cursor, len(change_broadcaster.sources))
+    if positions is not None:
+        await change_broadcaster.check_retained(positions)
+    return positions
+
+
+async def event_stream(request: Request, entity: str, after: list[int] | None) -> AsyncIterator[str]:
+    """
+    Format the change feed of an entity as Server-Sent Events.
+
+    Args:
+        request (Request): The streaming request, used to stop once the client disconnects.
+        entity (str): The entity to stream changes for.
+        after (list[int] | None): The position returned by ``resume_position``.
+    Yields:
+        str: SSE frames. When the feed is idle, a keep-alive frame carries the current position as its ``id``.
+    """
+    async for batch, cursor in change_broadcaster.listen(entity, after, settings.CHANGE_FEED_HEARTBEAT):
+        if await request.is_disconnected():
+            break
+        if not batch:
+            # a frame without data is not dispatched, but still sets the client's Last-Event-ID
+            yield f": keep-alive\nid: {cursor}\n\n"
+            continue
+        for change in batch:
+            data = json.dumps(change.model_dump(mode="json"))
+            yield f"id: {change.cursor}\nevent: {change.entity}.{change.op}\ndata: {data}\n\n"
+
+
+async def poll_changes(entity: str, after: list[int] | None, timeout: float) -> tuple[list[ChangePublic], str]:
+    """
+    Long-poll the change feed of an entity.
+
+    Args:
+        entity (str): The entity to read changes for.
+        after (list[int] | None): The position returned by ``resume_position``, or None to wait for new changes
+            only.
+        timeout (float): The maximum number of seconds to wait for a change.
+    Returns:
+        tuple[list[ChangePublic], str]: The next batch of changes, empty if none arrived before the timeout, and the
+            feed position to resume from.
+    """
+    listener = change_broadcaster.listen(entity, after, timeout)
+    try:
+        return await anext(listener)
+    finally:
+        await listener.aclose()
@@ -0,0 +1,236 @@
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compress a complete body with the configured level of the given encoding.
+
+    Args:
+        data (bytes): The body to compress.
+        encoding (str): One of the encodings returned by ``available_encodings()``.
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(data)
+    if encoding == "br":
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(encoding: str) -> _GzipStream | _BrotliStream | _ZstdStream:
+    if encoding == "zstd":
+        return _ZstdStream(settings.COMPRESSION_ZSTD_LEVEL)
+    if encoding == "br":
+        return _BrotliStream(settings.COMPRESSION_BROTLI_QUALITY)
+    return _GzipStream(settings.COMPRESSION_GZIP_LEVEL)
+
+
+def available_encodings() -> list[str]:
+    """Return the supported encodings, most preferred first."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate(accept_encoding: str, encodings: list[str]) -> str | None:
+    """
+    Pick the encoding to use for an ``Accept-Encoding`` header.
+
+    The client's quality values win; ties are broken by the server preference order of ``encodings``.
+
+    Args:
+        accept_encoding (str): The ``Accept-Encoding`` request header.
+        encodings (list[str]): The supported encodings, most preferred first.
+    Returns:
+        str | None: The chosen encoding, or None if the response should not be compressed.
+    """
+    qualities: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressedVariantCache:
+    """
+    Bounded LRU of compressed bodies keyed by a digest of the uncompressed body and the encoding.
+
+    Hashing a body is much cheaper than compressing it, so hot responses that are rendered to identical bytes are
+    compressed once per encoding instead of on every hit.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[bytes, str], bytes] = OrderedDict()
+
+    def get_or_compress(self, body: bytes, encoding: str) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        compressed = self._entries.get(key)
+        if compressed is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return compressed
+
+        self.misses += 1
+        compressed = compress(body, encoding)
+        if len(compressed) <= self.max_bytes:
+            self._entries[key] = compressed
+            self.size += len(compressed)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return compressed
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+compressed_variant_cache = CompressedVariantCache(settings.COMPRESSION_CACHE_BYTES)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding accepted by the client.
+
+    Complete bodies smaller than ``COMPRESSION_MIN_SIZE`` are sent as is, larger ones are compressed through the
+    compressed variant cache. Streaming responses are compressed chunk by chunk and flushed after every chunk so
+    that clients still receive data as it is produced.
+    """
+
+    def __init__(self, app: ASGIApp, cache: CompressedVariantCache = compressed_variant_cache):
+        self.app = app
+        self.cache = cache
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+        stream = None
+        passthrough = False
+
+        async def compress_send(message: Message):
+            nonlocal start_message, stream, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is not None:
+                chunk = stream.compress(body) if more_body else stream.compress(body) + stream.finish()
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            content_type = headers.get("content-type", "").split(";")[0].strip()
+            if (
+                "content-encoding" in headers
+                or content_type in settings.COMPRESSION_EXCLUDED_TYPES
+                or (not more_body and len(body) < settings.COMPRESSION_MIN_SIZE)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                stream = compress_stream(encoding)
+                body = stream.compress(body)
+            else:
+                body = self.cache.get_or_compress(body, encoding)
+                headers["Content-Length"] = str(len(body))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, compress_send)
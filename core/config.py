@@ -10,11 +10,90 @@ class Settings(BaseSettings):
 
     DATABASE_URL: str = "sqlite+aiosqlite:///./database.db"
     CHECK_SAME_THREAD: bool = False
+    SHARD_URLS: list[str] = []
 
     CORS_ORIGINS: list[str] = ["*"]
     DEBUG: bool = False
 
     LOG_LEVEL: str = "INFO"
 
+    IDEMPOTENCY_TTL: int = 24 * 60 * 60
+    IDEMPOTENCY_MAX_ENTRIES: int = 10_000
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 1024 * 1024
+
+    CHANGE_FEED_POLL_INTERVAL: float = 1.0
+    CHANGE_FEED_BATCH_SIZE: int = 500
+    CHANGE_FEED_QUEUE_SIZE: int = 1000
+    CHANGE_FEED_HEARTBEAT: float = 15.0
+    CHANGE_FEED_RETENTION: float = 7 * 24 * 60 * 60
+
+    COMPRESSION_MIN_SIZE: int = 500
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_CACHE_BYTES: int = 16 * 1024 * 1024
+    COMPRESSION_EXCLUDED_TYPES: list[str] = ["text/event-stream"]
+
+    API_KEYS: list[str] = []
+    RATE_LIMIT_PER_SECOND: float = 100.0
+    RATE_LIMIT_BURST: int = 200
+    RATE_LIMIT_MAX_CLIENTS: int = 10_000
+    ADMISSION_MAX_INFLIGHT_READS: int = 64
+    ADMISSION_MAX_INFLIGHT_WRITES: int = 16
+    ADMISSION_MAX_POOL_WAIT: float = 0.5
+    ADMISSION_RETRY_AFTER: float = 1.0
+    ADMISSION_EXEMPT_PATHS: list[str] = [
+        "/health",
+        "/docs",
+        "/redoc",
+        "/openapi.json",
+        "/items/changes",
+        "/users/changes",
+    ]
+
+    REQUEST_TIMEOUT_READ: float = 10.0
+    REQUEST_TIMEOUT_WRITE: float = 30.0
+    REQUEST_TIMEOUT_MAX: float = 60.0
+    REQUEST_TIMEOUT_ROUTES: dict[str, float] = {"/items/changes": 0, "/users/changes": 0, "/items/import": 0}
+    SQLITE_PROGRESS_STEPS: int = 1000
+
+    ADMIN_API_KEY: str | None = None
+    BACKUP_DIR: str = "./backups"
+    BACKUP_PAGES_PER_STEP: int = 256
+    BACKUP_STEP_SLEEP: float = 0.01
+    BACKUP_COMPRESS_LEVEL: int = 6
+    BACKUP_HISTORY: int = 20
+
+    BULK_CHUNK_SIZE: int = 500
+    IMPORT_CHUNK_SIZE: int = 5000
+    IMPORT_MAX_RECORD_LINES: int = 100
+    IMPORT_MAX_RECORD_SIZE: int = 65_536
+    IMPORT_REPORT_DIR: str = "./imports"
+
+    JOB_CONCURRENCY: int = 2
+    JOB_CHUNK_SIZE: int = 500
+    JOB_CHUNK_PAUSE: float = 0.01
+    JOB_HEARTBEAT_INTERVAL: float = 10.0
+    JOB_LEASE_TIMEOUT: float = 60.0
+
+    PURGE_INTERVAL: float = 5 * 60
+    PURGE_RETENTION: float = 7 * 24 * 60 * 60
+    PURGE_BATCH_SIZE: int = 500
+    PURGE_BATCH_PAUSE: float = 0.01
+    PURGE_VACUUM_PAGES: int = 1000
+
+    USER_FILTER_CAPACITY: int = 100_000
+    USER_FILTER_ERROR_RATE: float = 0.01
+    USER_FILTER_SCAN_BATCH: int = 10_000
+    USER_FILTER_SYNC_INTERVAL: float = 1.0
+
+    CACHE_PAGE_SIZE: int = 100
+    CACHE_WARM_PAGES: int = 5
+    CACHE_HOT_IDS: int = 1000
+    CACHE_TTL: float = 30.0
+    CACHE_REFRESH_DELAY: float = 0.05
+    CACHE_READS_MAX_KEYS: int = 100_000
+    CACHE_READS_FILE: str = "./cache_reads.json"
+
 
 settings = Settings()
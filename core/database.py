@@ -1,4 +1,7 @@
-from typing import AsyncGenerator
+import asyncio
+import functools
+import time
+from typing import AsyncGenerator, Awaitable, Callable, TypeVar
 
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
@@ -6,26 +9,88 @@ from sqlmodel import SQLModel
 
 from core.logging import logger
 
+from .admission import pool_monitor
 from .config import settings
+from .deadline import install_interrupt_handler
+from .migrations import enable_incremental_vacuum, upgrade_schema
+from .sharding import ShardRouter
 
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
     connect_args={"check_same_thread": settings.CHECK_SAME_THREAD},
 )
+if engine.dialect.name == "sqlite":
+    install_interrupt_handler(engine)
+
+shard_router = ShardRouter(settings.SHARD_URLS, engine) if settings.SHARD_URLS else None
 
 
 async def init_db():
     try:
+        if engine.dialect.name == "sqlite":
+            await enable_incremental_vacuum(engine)
         async with engine.begin() as conn:
             await conn.run_sync(SQLModel.metadata.create_all)
+            await conn.run_sync(upgrade_schema, SQLModel.metadata.sorted_tables)
+        if shard_router is not None:
+            await shard_router.init_shards()
         logger.info("Database tables created successfully")
     except SQLAlchemyError as e:
         logger.error(f"Failed to create database tables: {e}")
         raise
 
 
+def create_session() -> AsyncSession:
+    """Create a session on the users and items database, spanning all shards when sharding is configured."""
+    if shard_router is not None:
+        return shard_router.session(expire_on_commit=False)
+    return AsyncSession(engine, expire_on_commit=False)
+
+
+T = TypeVar("T")
+
+
+def uninterruptible(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Let database work run to completion when the task awaiting it is cancelled.
+
+    A cancellation that lands while aiosqlite runs a statement leaves its connection, and any lock it holds, open
+    until the connection is garbage collected. The decorated coroutine runs in its own task instead, and the
+    cancellation is raised once that task has finished and closed its connections.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs) -> T:
+        task = asyncio.ensure_future(func(*args, **kwargs))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            await asyncio.wait([task])
+            raise
+
+    return wrapper
+
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    session = create_session()
+    try:
+        if shard_router is None:
+            started = time.perf_counter()
+            await session.connection()
+            pool_monitor.record(time.perf_counter() - started)
+        yield session
+        await session.commit()
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Database session error: {e}")
+        raise
+    finally:
+        await session.close()
+
+
+async def get_main_session() -> AsyncGenerator[AsyncSession, None]:
+    """Yield a session on the main database, for tables that are never sharded such as jobs."""
     session = AsyncSession(engine, expire_on_commit=False)
     try:
         yield session
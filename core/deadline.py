@@ -0,0 +1,130 @@
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.exceptions import DeadlineExceededError
+
+from .config import settings
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+def get_deadline() -> float | None:
+    """Return the ``time.monotonic()`` deadline of the current request, if any."""
+    return _deadline.get()
+
+
+def check_deadline():
+    """
+    Raise if the deadline of the current request has passed.
+
+    Raises:
+        DeadlineExceededError: If the current request is past its deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is not None and time.monotonic() > deadline:
+        raise DeadlineExceededError()
+
+
+@contextmanager
+def deadline_scope(timeout: float | None) -> Iterator[None]:
+    """
+    Run the enclosed block with a deadline ``timeout`` seconds from now.
+
+    Args:
+        timeout (float | None): The number of seconds allowed, or None (or 0) for no deadline.
+    """
+    token = _deadline.set(time.monotonic() + timeout if timeout else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _default_timeout(scope: Scope) -> float:
+    for path, route_timeout in settings.REQUEST_TIMEOUT_ROUTES.items():
+        if scope["path"].startswith(path):
+            return route_timeout
+    if scope["method"] in ("GET", "HEAD", "OPTIONS"):
+        return settings.REQUEST_TIMEOUT_READ
+    return settings.REQUEST_TIMEOUT_WRITE
+
+
+def _route_timeout(scope: Scope) -> float:
+    default = _default_timeout(scope)
+    try:
+        requested = float(Headers(scope=scope).get("x-request-timeout", "nan"))
+    except ValueError:
+        return default
+    # clients may shorten the deadline but never lift it
+    if not math.isfinite(requested) or requested <= 0:
+        return default
+    return min(requested, default or settings.REQUEST_TIMEOUT_MAX)
+
+
+class DeadlineMiddleware:
+    """
+    Give every request a deadline.
+
+    The timeout comes from ``REQUEST_TIMEOUT_ROUTES`` for matching path prefixes, or from the read/write default. A
+    timeout of 0 disables the deadline. Clients can shorten it with the ``X-Request-Timeout`` header (in seconds,
+    capped at ``REQUEST_TIMEOUT_MAX`` on routes without a deadline); values that are not positive and finite are
+    ignored.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with deadline_scope(_route_timeout(scope)):
+            await self.app(scope, receive, send)
+
+
+def install_interrupt_handler(engine: AsyncEngine):
+    """
+    Interrupt SQLite statements that run past the deadline of the request that issued them.
+
+    A progress handler installed on every new connection checks the deadline of the statement being executed
+    every ``SQLITE_PROGRESS_STEPS`` virtual machine instructions. SQLite then aborts the statement with an
+    ``interrupted`` error, which the service layer turns into a 504, and the connection goes back to the pool.
+
+    Args:
+        engine (AsyncEngine): The SQLite engine to instrument.
+    """
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        statement_deadline: list[float | None] = [None]
+        connection_record.info["deadline"] = statement_deadline
+
+        def progress_handler() -> int:
+            deadline = statement_deadline[0]
+            return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+        dbapi_connection.await_(
+            dbapi_connection.driver_connection.set_progress_handler(progress_handler, settings.SQLITE_PROGRESS_STEPS)
+        )
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.connection.info["deadline"][0] = _deadline.get()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.connection.info["deadline"][0] = None
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and not context.connection.closed:
+            context.connection.connection.info["deadline"][0] = None
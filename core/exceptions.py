@@ -8,10 +8,37 @@ from core.response import StandardResponse
 
 
 class NotFoundError(HTTPException):
-    def __init__(self, item_name: str, item_id: int):
+    def __init__(self, item_name: str, item_id: int | str):
         super().__init__(status_code=404, detail=f"{item_name} not found with ID: {item_id}")
 
 
+class ConflictError(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=409, detail=detail)
+
+
+class InvalidCursorError(HTTPException):
+    def __init__(self, cursor: str):
+        super().__init__(status_code=422, detail=f"Invalid change feed position: {cursor}")
+
+
+class NotReadyError(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=503, detail=detail)
+
+
+class CursorTooOldError(HTTPException):
+    def __init__(self, cursor: str):
+        super().__init__(
+            status_code=410, detail=f"Change feed position is older than the retained change log: {cursor}"
+        )
+
+
+class DeadlineExceededError(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=504, detail="Request deadline exceeded")
+
+
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logger.error(f"Validation error: {exc.errors()}")
     return JSONResponse(
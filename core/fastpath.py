@@ -0,0 +1,97 @@
+import asyncio
+import heapq
+import itertools
+from typing import Sequence
+
+from pydantic import TypeAdapter
+from sqlalchemy import Row, Select, bindparam, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlmodel import SQLModel
+from typing_extensions import TypedDict
+
+from models import Item, ItemPublic, User, UserPublic
+
+
+class ListQuery:
+    """
+    Page through the live rows of a table without the ORM.
+
+    The statements select only the columns of the public model and are built once with bound parameters, so every
+    request reuses the same compiled SQL. Rows come back as plain tuples from a Core connection and are serialized
+    straight to JSON by a TypeAdapter over a TypedDict mirroring the public model; no ORM or Pydantic model instance
+    is created.
+    """
+
+    def __init__(self, model: type[SQLModel], public: type[SQLModel]):
+        table = model.__table__
+        self.fields = list(public.model_fields)
+        self.key = table.c.id
+        live = select(*(table.c[name] for name in self.fields)).where(table.c.deleted_at.is_(None))
+        self.page = live.order_by(self.key).offset(bindparam("offset")).limit(bindparam("limit"))
+        self.page_after = live.where(self.key > bindparam("after_id")).order_by(self.key).limit(bindparam("limit"))
+        self.key_index = self.fields.index("id")
+
+        record = TypedDict(
+            f"{public.__name__}Record", {name: field.annotation for name, field in public.model_fields.items()}
+        )
+        envelope = TypedDict(f"{public.__name__}Page", {"status": str, "data": list[record], "message": str | None})
+        self._adapter = TypeAdapter(envelope)
+
+    async def fetch(
+        self, session: AsyncSession, offset: int = 0, limit: int = 100, after_id: int | None = None
+    ) -> list[Row]:
+        """
+        Fetch one page of rows, following ``after_id`` if given, otherwise skipping ``offset`` rows.
+
+        Args:
+            session (AsyncSession): The request session. On a sharded session every shard is read concurrently and
+                the pages are merged.
+            offset (int, optional): The number of rows to skip. Defaults to 0.
+            limit (int, optional): The maximum number of rows to return. Defaults to 100.
+            after_id (int | None, optional): The last ID of the previous page. Defaults to None.
+        Returns:
+            list[Row]: The rows, as tuples in the order of the public model's fields.
+        """
+        if after_id is not None:
+            statement, params = self.page_after, {"after_id": after_id, "limit": limit}
+        else:
+            statement, params = self.page, {"offset": offset, "limit": limit}
+
+        router = session.info.get("shard_router")
+        if router is None:
+            conn = await session.connection()
+            result = await conn.execute(statement, params)
+            return result.all()
+
+        if after_id is None:
+            params = {"offset": 0, "limit": offset + limit}
+        pages = await asyncio.gather(
+            *(self._fetch_shard(shard_engine, statement, params) for shard_engine in router.engines.values())
+        )
+        start = offset if after_id is None else 0
+        merged = heapq.merge(*pages, key=lambda row: row[self.key_index])
+        return list(itertools.islice(merged, start, start + limit))
+
+    @staticmethod
+    async def _fetch_shard(shard_engine: AsyncEngine, statement: Select, params: dict) -> Sequence[Row]:
+        async with shard_engine.connect() as conn:
+            result = await conn.execute(statement, params)
+            return result.all()
+
+    def serialize(self, rows: Sequence[Row], message: str) -> bytes:
+        """
+        Render rows as the JSON of a successful ``StandardResponse``.
+
+        Args:
+            rows (Sequence[Row]): The rows returned by ``fetch``.
+            message (str): The response message.
+        Returns:
+            bytes: The response body.
+        """
+        fields = self.fields
+        data = [dict(zip(fields, row)) for row in rows]
+        return self._adapter.dump_json({"status": "success", "data": data, "message": message})
+
+
+item_listing = ListQuery(Item, ItemPublic)
+user_listing = ListQuery(User, UserPublic)
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.logging import logger
+from core.response import StandardResponse
+
+from .config import settings
+
+
+@dataclass
+class StoredResponse:
+    fingerprint: str
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+    expires_at: float
+
+
+class IdempotencyStore:
+    """
+    Bounded LRU store of completed responses keyed by idempotency key.
+
+    Entries expire after ``ttl`` seconds. Keys whose request is still being processed are tracked as in-flight
+    futures so that concurrent duplicates wait for the first request instead of running the service again.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, StoredResponse] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def get(self, key: str) -> StoredResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, fingerprint: str, status: int, headers: list[tuple[bytes, bytes]], body: bytes):
+        self._entries[key] = StoredResponse(fingerprint, status, headers, body, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def inflight(self, key: str) -> asyncio.Future | None:
+        return self._inflight.get(key)
+
+    def begin(self, key: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+
+    def finish(self, key: str):
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+idempotency_store = IdempotencyStore(settings.IDEMPOTENCY_MAX_ENTRIES, settings.IDEMPOTENCY_TTL)
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content=StandardResponse(status="error", data={}, message=message).model_dump(),
+    )
+
+
+class IdempotencyMiddleware:
+    """
+    Replay stored responses for ``POST`` requests carrying an ``Idempotency-Key`` header.
+
+    Keys are scoped to the client, identified by its ``X-API-Key`` or else its address, and to the path.
+
+    The first request with a given key runs normally and its response is stored. Retries with the same key and
+    payload get the stored bytes back, and a retry that arrives while the first request is still running waits
+    for it. Reusing a key with a different payload is rejected with 422. Server errors are not stored so that a
+    retry can succeed.
+    """
+
+    header = b"idempotency-key"
+
+    def __init__(self, app: ASGIApp, store: IdempotencyStore = idempotency_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(self.header)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        try:
+            content_length = int(headers[b"content-length"])
+        except KeyError:
+            content_length = None
+        except ValueError:
+            content_length = -1
+        if content_length is not None and content_length < 0:
+            response = _error(400, "Invalid Content-Length header")
+            await response(scope, receive, send)
+            return
+        if content_length is None or content_length > settings.IDEMPOTENCY_MAX_BODY_BYTES:
+            await self.app(scope, receive, send)
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        key = b"|".join([self._client(scope, headers), scope["path"].encode(), idempotency_key]).decode("latin-1")
+        fingerprint = hashlib.sha256(scope["query_string"] + b"\n" + body).hexdigest()
+
+        while True:
+            stored = self.store.get(key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    response = _error(422, "Idempotency-Key was already used with a different request")
+                    await response(scope, receive, send)
+                    return
+                logger.info(f"Replaying stored response for idempotency key: {idempotency_key.decode('latin-1')}")
+                await self._replay(stored, send)
+                return
+            future = self.store.inflight(key)
+            if future is None:
+                break
+            await asyncio.shield(future)
+
+        self.store.begin(key)
+        try:
+            await self._run(scope, body, receive, send, key, fingerprint)
+        finally:
+            self.store.finish(key)
+
+    async def _run(self, scope: Scope, body: bytes, receive: Receive, send: Send, key: str, fingerprint: str):
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status = 500
+        response_headers: list[tuple[bytes, bytes]] = []
+        chunks: list[bytes] = []
+
+        async def capture_send(message: Message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False) and status < 500:
+                    self.store.put(key, fingerprint, status, response_headers, b"".join(chunks))
+            await send(message)
+
+        await self.app(scope, replay_receive, capture_send)
+
+    @staticmethod
+    def _client(scope: Scope, headers: dict[bytes, bytes]) -> bytes:
+        """Namespace keys by API key, or by client address for anonymous requests, so clients never share keys."""
+        api_key = headers.get(b"x-api-key")
+        if api_key:
+            return b"key:" + api_key
+        host = scope["client"][0] if scope.get("client") else ""
+        return b"addr:" + host.encode()
+
+    @staticmethod
+    async def _replay(stored: StoredResponse, send: Send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": stored.headers + [(b"idempotent-replayed", b"true")],
+            }
+        )
+        await send({"type": "http.response.body", "body": stored.body})
@@ -0,0 +1,263 @@
+import codecs
+import csv
+import json
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import AsyncIterator, Iterator, TextIO
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from core.logging import logger
+from models import Item, ItemImport, ItemPublic, User
+
+from .changefeed import change_broadcaster, record_change
+from .config import settings
+from .database import create_session, engine, shard_router
+
+IMPORT_FORMATS = {"csv": ("text/csv", ".csv"), "ndjson": ("application/x-ndjson", ".ndjson", ".jsonl")}
+
+_batch_adapter = TypeAdapter(list[ItemImport])
+
+
+class ImportSummary(BaseModel):
+    format: str
+    report: str
+    read: int = 0
+    imported: int = 0
+    rejected: int = 0
+
+
+def detect_format(name: str | None = None, content_type: str | None = None) -> str | None:
+    """Guess the import format from a file name or a content type."""
+    for import_format, (media_type, *suffixes) in IMPORT_FORMATS.items():
+        if content_type and content_type.split(";")[0].strip() == media_type:
+            return import_format
+        if name and name.endswith(tuple(suffixes)):
+            return import_format
+    return None
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.removesuffix("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.removesuffix("\r")
+
+
+async def _records(chunks: AsyncIterator[bytes], import_format: str) -> AsyncIterator[tuple[int, dict | str, str]]:
+    """Yield ``(line, record, error)`` for every record of the input, ``error`` being empty for parsed records."""
+    number = 0
+    if import_format == "ndjson":
+        async for line in _lines(chunks):
+            number += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, line, f"Invalid JSON: {e}"
+                continue
+            yield (number, record, "") if isinstance(record, dict) else (number, line, "Expected a JSON object")
+        return
+
+    header: list[str] | None = None
+    reader = _CsvRecordReader(settings.IMPORT_MAX_RECORD_LINES, settings.IMPORT_MAX_RECORD_SIZE)
+
+    def parse(line_number: int, text: str, error: str) -> tuple[int, dict | str, str] | None:
+        nonlocal header
+        if error:
+            return line_number, text, error
+        if not text.strip():
+            return None
+        fields = next(csv.reader([text]))
+        if header is None:
+            header = fields
+            return None
+        if len(fields) != len(header):
+            return line_number, text, f"Expected {len(header)} fields, got {len(fields)}"
+        return line_number, {name: value or None for name, value in zip(header, fields)}, ""
+
+    async for line in _lines(chunks):
+        number += 1
+        for record in reader.feed(number, line):
+            if (parsed := parse(*record)) is not None:
+                yield parsed
+    for record in reader.finish():
+        if (parsed := parse(*record)) is not None:
+            yield parsed
+
+
+class _CsvRecordReader:
+    """
+    Join the lines of CSV records whose quoted fields span several lines.
+
+    A record that is still open after ``max_lines`` lines or ``max_size`` characters is rejected with its first
+    line only, and the lines after it are read again as new records, so that a stray quote costs one row instead
+    of the rest of the file.
+    """
+
+    def __init__(self, max_lines: int, max_size: int):
+        self.max_lines = max_lines
+        self.max_size = max_size
+        self._reset()
+
+    def _reset(self):
+        self.pending: list[tuple[int, str]] = []
+        self.quotes = 0
+        self.size = 0
+
+    def feed(self, number: int, line: str) -> Iterator[tuple[int, str, str]]:
+        """Yield ``(line, text, error)`` for every record completed or rejected by this line."""
+        lines = deque([(number, line)])
+        while lines:
+            number, line = lines.popleft()
+            self.pending.append((number, line))
+            self.quotes += line.count('"')
+            self.size += len(line) + 1
+            # an odd number of quotes means a quoted field continues on the next line
+            if self.quotes % 2 == 0:
+                yield self.pending[0][0], "\n".join(text for _, text in self.pending), ""
+                self._reset()
+            elif len(self.pending) >= self.max_lines or self.size > self.max_size:
+                (start, first), *rest = self.pending
+                self._reset()
+                yield start, first, "Unterminated quoted field"
+                lines.extendleft(reversed(rest))
+
+    def finish(self) -> Iterator[tuple[int, str, str]]:
+        """Yield the records left open at the end of the input."""
+        while self.pending:
+            (start, first), *rest = self.pending
+            self._reset()
+            yield start, first, "Unterminated quoted field"
+            for number, line in rest:
+                yield from self.feed(number, line)
+
+
+def _validate(batch: list[tuple[int, dict]]) -> tuple[list[tuple[int, ItemImport]], list[tuple[int, dict, str]]]:
+    """Validate a batch of records at once, returning the valid items and the rejected records."""
+    try:
+        items = _batch_adapter.validate_python([record for _, record in batch])
+        return list(zip((number for number, _ in batch), items)), []
+    except ValidationError as e:
+        errors: dict[int, str] = {}
+        for error in e.errors():
+            index, *location = error["loc"]
+            errors.setdefault(index, f"{'.'.join(map(str, location))}: {error['msg']}")
+    rejected = [(batch[index][0], batch[index][1], message) for index, message in errors.items()]
+    valid = [entry for index, entry in enumerate(batch) if index not in errors]
+    items = _batch_adapter.validate_python([record for _, record in valid])
+    return list(zip((number for number, _ in valid), items)), rejected
+
+
+async def live_owner_ids() -> set[int]:
+    """Load the IDs of every live user, streaming them from each database."""
+    owner_ids: set[int] = set()
+    for db_engine in list(shard_router.engines.values()) if shard_router is not None else [engine]:
+        async with AsyncSession(db_engine) as session:
+            result = await session.stream_scalars(
+                select(User.id)
+                .where(User.deleted_at.is_(None))
+                .execution_options(yield_per=settings.USER_FILTER_SCAN_BATCH)
+            )
+            async for owner_id in result:
+                owner_ids.add(owner_id)
+    return owner_ids
+
+
+class ItemImporter:
+    """
+    Import items from a CSV or NDJSON stream with constant memory.
+
+    Records are parsed as the bytes arrive, validated ``chunk_size`` at a time and inserted with one executemany
+    statement per chunk (per shard when sharding is configured), each chunk committing with its change log entries.
+    Owners are checked against the live user IDs loaded when the import starts. Rejected records and a progress
+    line after every chunk are written as JSON lines to the report file.
+    """
+
+    def __init__(self, report: Path, chunk_size: int | None = None):
+        self.report = report
+        self.chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+
+    async def run(self, chunks: AsyncIterator[bytes], import_format: str) -> ImportSummary:
+        """
+        Import a stream.
+
+        Args:
+            chunks (AsyncIterator[bytes]): The content, in chunks of any size.
+            import_format (str): ``"csv"`` (with a header row) or ``"ndjson"``.
+        Returns:
+            ImportSummary: The number of records read, imported and rejected.
+        """
+        summary = ImportSummary(format=import_format, report=str(self.report))
+        owner_ids = await live_owner_ids()
+        self.report.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.report, "w", encoding="utf-8") as report:
+            batch: list[tuple[int, dict]] = []
+            async for number, record, error in _records(chunks, import_format):
+                summary.read += 1
+                if error:
+                    self._reject(report, summary, number, record, error)
+                    continue
+                batch.append((number, record))
+                if len(batch) >= self.chunk_size:
+                    await self._import_batch(report, summary, batch, owner_ids)
+                    batch = []
+            if batch:
+                await self._import_batch(report, summary, batch, owner_ids)
+            report.write(json.dumps({"done": summary.model_dump()}) + "\n")
+        logger.info(f"Import finished: {summary}")
+        return summary
+
+    async def _import_batch(
+        self, report: TextIO, summary: ImportSummary, batch: list[tuple[int, dict]], owner_ids: set[int]
+    ):
+        items, rejected = _validate(batch)
+        for number, record, error in rejected:
+            self._reject(report, summary, number, record, error)
+        rows = []
+        for number, item in items:
+            if item.owner_id in owner_ids:
+                rows.append(item.model_dump())
+            else:
+                self._reject(report, summary, number, item.model_dump(), "Unknown owner")
+        if rows:
+            await self._insert(rows)
+            change_broadcaster.notify()
+        summary.imported += len(rows)
+        report.write(json.dumps({"progress": summary.model_dump(include={"read", "imported", "rejected"})}) + "\n")
+        report.flush()
+
+    @staticmethod
+    async def _insert(rows: list[dict]):
+        async with create_session() as session:
+            if shard_router is None:
+                result = await session.execute(insert(Item).returning(Item.id, sort_by_parameter_order=True), rows)
+                for row, item_id in zip(rows, result.scalars()):
+                    row["id"] = item_id
+            else:
+                by_shard: dict[str, list[dict]] = defaultdict(list)
+                for row in rows:
+                    by_shard[shard_router.shard_for(row["owner_id"])].append(row)
+                for shard_id, shard_rows in by_shard.items():
+                    item_ids = await session.run_sync(shard_router.allocate_ids, shard_id, len(shard_rows))
+                    for row, item_id in zip(shard_rows, item_ids):
+                        row["id"] = item_id
+                    await session.execute(insert(Item.__table__), shard_rows, bind_arguments={"shard_id": shard_id})
+            for row in rows:
+                record_change(session, "item", "create", row["id"], ItemPublic.model_validate(row))
+            await session.commit()
+
+    @staticmethod
+    def _reject(report: TextIO, summary: ImportSummary, number: int, record: dict | str, error: str):
+        summary.rejected += 1
+        report.write(json.dumps({"line": number, "error": error, "record": record}, default=str) + "\n")
@@ -0,0 +1,361 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlmodel import select
+
+from core.logging import logger
+from models import (
+    BulkDeleteParams,
+    Item,
+    ItemImport,
+    ItemPublic,
+    Job,
+    JobInput,
+    User,
+    UserPublic,
+)
+
+from .bloom import user_filter
+from .changefeed import change_broadcaster, record_change
+from .config import settings
+from .database import create_session, engine, shard_router, uninterruptible
+
+JobHandler = Callable[["JobContext"], Awaitable[None]]
+
+
+class LeaseLostError(Exception):
+    """Raised when a job's lease was taken over by another worker, which now runs the job."""
+
+
+class JobStoppedError(Exception):
+    """Raised when the runner stops after a chunk was committed; the job resumes from that chunk's checkpoint."""
+
+
+_handlers: dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the handler running the jobs of a kind."""
+
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+
+    return register
+
+
+class JobContext:
+    """
+    The state of a running job, as seen by its handler.
+
+    Handlers work in chunks and call ``commit`` after each one with the position to resume from. Without sharding
+    the job row is updated in the same transaction as the chunk, so a resumed job never repeats work. With sharding
+    the job row lives on the main database and is updated right after the chunk commits; a restart in between
+    runs the last chunk again. ``commit`` raises ``LeaseLostError`` once another worker has taken the job over, and
+    ``JobStoppedError`` once the runner is stopping.
+    """
+
+    def __init__(self, job: Job, stopping: asyncio.Event | None = None):
+        self.job_id = job.id
+        self.owner = job.owner
+        self.params = job.params
+        self.progress = job.progress
+        self.checkpoint = job.checkpoint or {}
+        self._stopping = stopping
+
+    async def commit(self, session: AsyncSession | None, progress: int, checkpoint: dict, total: int | None = None):
+        """
+        Commit a chunk of work and record the job's progress.
+
+        Args:
+            session (AsyncSession | None): The session holding the chunk, or None if there is nothing to commit.
+            progress (int): The number of rows processed so far.
+            checkpoint (dict): The position to resume from.
+            total (int | None, optional): The number of rows to process, if known.
+        """
+        self.progress, self.checkpoint = progress, checkpoint
+        now = datetime.now(timezone.utc)
+        values = {"progress": progress, "checkpoint": checkpoint, "heartbeat": now, "updated_at": now}
+        if total is not None:
+            values["total"] = total
+        statement = update(Job).where(Job.id == self.job_id, Job.owner == self.owner).values(**values)
+        if session is not None and shard_router is None:
+            result = await session.execute(statement)
+            if result.rowcount == 0:
+                await session.rollback()
+                raise LeaseLostError(self.job_id)
+            await session.commit()
+        else:
+            if session is not None:
+                await session.commit()
+            async with AsyncSession(engine) as main_session:
+                result = await main_session.execute(statement)
+                await main_session.commit()
+            if result.rowcount == 0:
+                raise LeaseLostError(self.job_id)
+        change_broadcaster.notify()
+        if self._stopping is not None and self._stopping.is_set():
+            raise JobStoppedError(self.job_id)
+        await asyncio.sleep(settings.JOB_CHUNK_PAUSE)
+
+
+class JobRunner:
+    """
+    Run jobs in the background of the application's event loop.
+
+    Jobs are stored in the ``job`` table and picked up by ``concurrency`` worker tasks. Every runner, one per
+    application process, claims a job by setting itself as its ``owner`` in a single conditional UPDATE, and renews
+    the ``heartbeat`` of the jobs it runs every ``heartbeat_interval`` seconds. Pending jobs, and running jobs
+    whose heartbeat is older than ``lease_timeout`` because their runner stopped, are picked up by the next scan of
+    any runner and resume from their last checkpoint.
+    """
+
+    def __init__(self, concurrency: int, heartbeat_interval: float, lease_timeout: float):
+        self.concurrency = concurrency
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_timeout = lease_timeout
+        self.owner = uuid.uuid4().hex
+        self._queue: asyncio.Queue[int] | None = None
+        self._queued: set[int] = set()
+        self._workers: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._stopping = asyncio.Event()
+        self._queued = set()
+        job_ids = await self._scan()
+        if job_ids:
+            logger.info(f"Resuming {len(job_ids)} jobs")
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        """
+        Stop the workers. Running jobs stop after their current chunk, keep its checkpoint and resume once their
+        lease expires.
+        """
+        self._stopping.set()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def enqueue(self, job_id: int):
+        """Queue a committed job. Jobs created while the runner is stopped are picked up by the next scan."""
+        if self._queue is not None and job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _scan(self) -> list[int]:
+        """Queue the pending jobs and the running jobs whose lease expired."""
+        async with AsyncSession(engine) as session:
+            result = await session.execute(select(Job.id).where(self._claimable()).order_by(Job.id))
+            job_ids = result.scalars().all()
+        for job_id in job_ids:
+            self.enqueue(job_id)
+        return job_ids
+
+    def _claimable(self):
+        stale = datetime.now(timezone.utc) - timedelta(seconds=self.lease_timeout)
+        return or_(
+            Job.status == "pending",
+            (Job.status == "running") & (Job.heartbeat.is_(None) | (Job.heartbeat < stale)),
+        )
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._renew()
+            except Exception as e:
+                logger.error(f"Failed to renew job leases: {e}")
+
+    @uninterruptible
+    async def _renew(self):
+        async with AsyncSession(engine) as session:
+            await session.execute(
+                update(Job)
+                .where(Job.owner == self.owner, Job.status == "running")
+                .values(heartbeat=datetime.now(timezone.utc))
+            )
+            await session.commit()
+        await self._scan()
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            await self._run(job_id)
+
+    @uninterruptible
+    async def _run(self, job_id: int):
+        """Run a job; a cancelled worker waits until the job reaches its next checkpoint and stops."""
+        try:
+            await self._execute(job_id)
+        except Exception as e:
+            logger.error(f"Job {job_id} could not be run: {e}")
+            try:
+                await self._finish(job_id, "failed", str(e))
+            except Exception as e:
+                logger.error(f"Failed to mark job {job_id} as failed: {e}")
+        finally:
+            self._queued.discard(job_id)
+
+    async def _claim(self, job_id: int) -> Job | None:
+        """Take the lease of a pending or abandoned job, returning None if another runner holds it."""
+        now = datetime.now(timezone.utc)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            result = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, self._claimable())
+                .values(status="running", owner=self.owner, heartbeat=now, updated_at=now)
+            )
+            await session.commit()
+            if result.rowcount == 0:
+                return None
+            return await session.get(Job, job_id)
+
+    async def _execute(self, job_id: int):
+        job = await self._claim(job_id)
+        if job is None:
+            return
+
+        logger.info(f"Job {job_id} started: {job.kind}")
+        try:
+            await _handlers[job.kind](JobContext(job, self._stopping))
+        except LeaseLostError:
+            logger.warning(f"Job {job_id} was taken over by another worker")
+        except JobStoppedError:
+            logger.info(f"Job {job_id} stopped, it resumes from its last checkpoint")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            await self._finish(job_id, "failed", str(e))
+        else:
+            logger.info(f"Job {job_id} completed")
+            await self._finish(job_id, "completed")
+
+    async def _finish(self, job_id: int, status: str, error: str | None = None):
+        async with AsyncSession(engine) as session:
+            result = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.owner == self.owner)
+                .values(status=status, error=error, updated_at=datetime.now(timezone.utc))
+            )
+            if result.rowcount:
+                await session.execute(delete(JobInput).where(JobInput.job_id == job_id))
+            await session.commit()
+
+
+job_runner = JobRunner(settings.JOB_CONCURRENCY, settings.JOB_HEARTBEAT_INTERVAL, settings.JOB_LEASE_TIMEOUT)
+
+
+def _delete_items(items: list[Item], session: AsyncSession):
+    deleted_at = datetime.now(timezone.utc)
+    for item in items:
+        item.deleted_at = deleted_at
+        record_change(session, "item", "delete", item.id, ItemPublic.model_validate(item))
+
+
+@job_handler("bulk_delete")
+async def bulk_delete(context: JobContext):
+    """Soft delete a list of items, or a user after soft deleting their items one chunk at a time."""
+    params = BulkDeleteParams.model_validate(context.params)
+    progress = context.progress
+
+    if params.item_ids:
+        position = context.checkpoint.get("position", 0)
+        while position < len(params.item_ids):
+            chunk = params.item_ids[position : position + settings.JOB_CHUNK_SIZE]
+            async with create_session() as session:
+                result = await session.execute(select(Item).where(Item.id.in_(chunk), Item.deleted_at.is_(None)))
+                items = result.scalars().all()
+                _delete_items(items, session)
+                position += len(chunk)
+                progress += len(items)
+                await context.commit(session, progress, {"position": position}, total=len(params.item_ids))
+        return
+
+    async with create_session() as session:
+        remaining = await session.scalar(
+            select(func.count()).select_from(Item).where(Item.owner_id == params.user_id, Item.deleted_at.is_(None))
+        )
+        await context.commit(None, progress, context.checkpoint, total=progress + remaining + 1)
+
+    while True:
+        async with create_session() as session:
+            result = await session.execute(
+                select(Item)
+                .where(Item.owner_id == params.user_id, Item.deleted_at.is_(None))
+                .order_by(Item.id)
+                .limit(settings.JOB_CHUNK_SIZE)
+            )
+            items = result.scalars().all()
+            if not items:
+                break
+            _delete_items(items, session)
+            progress += len(items)
+            await context.commit(session, progress, {"items_deleted": progress})
+
+    async with create_session() as session:
+        user = await session.get(User, params.user_id)
+        deleted = user is not None and user.deleted_at is None
+        if deleted:
+            user.deleted_at = datetime.now(timezone.utc)
+            record_change(session, "user", "delete", user.id, UserPublic.model_validate(user))
+        await context.commit(session, progress + 1, {"user_deleted": True})
+        if deleted:
+            await user_filter.remove([user])
+
+
+@job_handler("bulk_import")
+async def bulk_import(context: JobContext):
+    """Create items one chunk at a time, skipping rows whose owner does not exist."""
+    total = context.params["count"]
+    position = context.checkpoint.get("position", 0)
+    rejected = context.checkpoint.get("rejected", 0)
+    progress = context.progress
+
+    while position < total:
+        async with AsyncSession(engine) as main_session:
+            result = await main_session.execute(
+                select(JobInput.data)
+                .where(JobInput.job_id == context.job_id, JobInput.position >= position)
+                .order_by(JobInput.position)
+                .limit(settings.JOB_CHUNK_SIZE)
+            )
+            chunk = [ItemImport.model_validate(data) for data in result.scalars()]
+        if not chunk:
+            break
+        async with create_session() as session:
+            owner_ids = {row.owner_id for row in chunk}
+            result = await session.execute(select(User.id).where(User.id.in_(owner_ids), User.deleted_at.is_(None)))
+            existing = set(result.scalars().all())
+            items = [Item(**row.model_dump()) for row in chunk if row.owner_id in existing]
+            session.add_all(items)
+            await session.flush()
+            for item in items:
+                record_change(session, "item", "create", item.id, ItemPublic.model_validate(item))
+            position += len(chunk)
+            progress += len(items)
+            rejected += len(chunk) - len(items)
+            checkpoint = {"position": position, "rejected": rejected}
+            await context.commit(session, progress, checkpoint, total=total)
+
+
+@job_handler("reindex")
+async def reindex(context: JobContext):
+    """Rebuild the indexes and refresh the query planner statistics of every table, one table at a time."""
+    engines: list[AsyncEngine] = [engine] + (list(shard_router.engines.values()) if shard_router is not None else [])
+    tables = [(db_engine, table) for db_engine in engines for table in (User.__tablename__, Item.__tablename__)]
+    position = context.checkpoint.get("position", 0)
+    for db_engine, table in tables[position:]:
+        async with db_engine.begin() as conn:
+            await conn.exec_driver_sql(f'REINDEX "{table}"')
+            await conn.exec_driver_sql(f'ANALYZE "{table}"')
+        position += 1
+        await context.commit(None, position, {"position": position}, total=len(tables))
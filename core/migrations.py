@@ -0,0 +1,55 @@
+from sqlalchemy import Connection, Table, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateColumn
+
+from core.logging import logger
+
+
+def upgrade_schema(connection: Connection, tables: list[Table]):
+    """
+    Bring existing tables up to date with their models.
+
+    ``create_all`` only creates missing tables, so columns and indexes added to a model later are created here.
+    New columns must be nullable or have a server default, as SQLite adds them to every existing row. A unique
+    index that existing rows violate is skipped with a warning until the duplicates are resolved.
+
+    Args:
+        connection (Connection): A connection inside a transaction.
+        tables (list[Table]): The tables to upgrade.
+    """
+    inspector = inspect(connection)
+    for table in tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}')
+                logger.info(f"Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            try:
+                index.create(connection, checkfirst=True)
+            except IntegrityError as e:
+                logger.warning(f"Skipped unique index {index.name}, existing rows have duplicates: {e.orig}")
+
+
+async def enable_incremental_vacuum(engine: AsyncEngine):
+    """
+    Switch a SQLite database to ``auto_vacuum = INCREMENTAL`` so that freed pages can be returned to the file
+    system in small steps with ``PRAGMA incremental_vacuum``.
+
+    The mode of an existing database only changes after a full ``VACUUM``, which runs once here.
+
+    Args:
+        engine (AsyncEngine): The SQLite engine.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar() == 2:
+            return
+        await conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        if (await conn.exec_driver_sql("SELECT count(*) FROM sqlite_master")).scalar():
+            logger.info(f"Running VACUUM to enable incremental vacuum on {engine.url.database}")
+            await conn.exec_driver_sql("VACUUM")
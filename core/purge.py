@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import ColumnElement, Delete, Table, delete, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.logging import logger
+from models import Change, Item, User
+
+from .config import settings
+from .database import engine, shard_router, uninterruptible
+
+
+class TombstonePurger:
+    """
+    Periodically remove soft deleted rows once they are older than the retention period, and change log entries
+    older than the change feed retention period.
+
+    Rows are deleted ``batch_size`` at a time in short transactions so that request writers are never blocked for
+    long. Freed pages are then returned to the file system with ``PRAGMA incremental_vacuum``. The newest change of
+    each log is always kept, so that change IDs keep increasing and feed positions stay comparable.
+    """
+
+    def __init__(self, interval: float, retention: float, change_retention: float, batch_size: int):
+        self.interval = interval
+        self.retention = retention
+        self.change_retention = change_retention
+        self.batch_size = batch_size
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def purge(self) -> int:
+        """
+        Purge the expired tombstones of every database once.
+
+        Returns:
+            int: The number of rows removed.
+        """
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(seconds=self.retention)
+        change_cutoff = now - timedelta(seconds=self.change_retention)
+        engines = [engine] + (list(shard_router.engines.values()) if shard_router is not None else [])
+        purged = 0
+        for db_engine in engines:
+            # items first, so that no item outlives its owner
+            for table in (Item.__table__, User.__table__):
+                purged += await self._purge_table(
+                    db_engine, table, table.c.deleted_at.is_not(None), table.c.deleted_at < cutoff
+                )
+            changes = Change.__table__
+            newest = select(func.max(changes.c.id)).scalar_subquery()
+            purged += await self._purge_table(
+                db_engine, changes, changes.c.created_at < change_cutoff, changes.c.id < newest
+            )
+            if db_engine.dialect.name == "sqlite":
+                await self._vacuum(db_engine)
+        if purged:
+            logger.info(f"Purged {purged} deleted rows")
+        return purged
+
+    async def _purge_table(self, db_engine: AsyncEngine, table: Table, *conditions: ColumnElement[bool]) -> int:
+        purged = 0
+        expired = select(table.c.id).where(*conditions).limit(self.batch_size).scalar_subquery()
+        while True:
+            deleted = await self._delete(db_engine, delete(table).where(table.c.id.in_(expired)))
+            purged += deleted
+            if deleted < self.batch_size:
+                return purged
+            await asyncio.sleep(settings.PURGE_BATCH_PAUSE)
+
+    @uninterruptible
+    async def _delete(self, db_engine: AsyncEngine, statement: Delete) -> int:
+        async with db_engine.begin() as conn:
+            result = await conn.execute(statement)
+        return result.rowcount
+
+    @uninterruptible
+    async def _vacuum(self, db_engine: AsyncEngine):
+        async with db_engine.begin() as conn:
+            await conn.exec_driver_sql(f"PRAGMA incremental_vacuum({settings.PURGE_VACUUM_PAGES})")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.purge()
+            except SQLAlchemyError as e:
+                logger.error(f"Failed to purge deleted rows: {e}")
+
+
+tombstone_purger = TombstonePurger(
+    settings.PURGE_INTERVAL, settings.PURGE_RETENTION, settings.CHANGE_FEED_RETENTION, settings.PURGE_BATCH_SIZE
+)
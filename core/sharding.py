@@ -0,0 +1,274 @@
+import itertools
+import sqlite3
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    event,
+    insert,
+    update,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.sql import ColumnElement, operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+from sqlmodel import SQLModel
+
+from core.logging import logger
+from models import Change, Item, User
+
+from .config import settings
+from .deadline import install_interrupt_handler
+from .migrations import enable_incremental_vacuum, upgrade_schema
+
+SHARDED_TABLES = [User.__table__, Item.__table__, Change.__table__]
+
+sequence_metadata = MetaData()
+sequence_table = Table(
+    "shard_sequence",
+    sequence_metadata,
+    Column("name", String, primary_key=True),
+    Column("value", Integer, nullable=False),
+)
+
+lock_metadata = MetaData()
+lock_table = Table("shard_lock", lock_metadata, Column("name", String, primary_key=True))
+
+
+class _ShardedSession(ShardedSession):
+    pass
+
+
+class ShardRouter:
+    """
+    Route users and their items to one of N SQLite databases.
+
+    Every user and item gets an ID ``n * N + shard`` where ``n`` comes from a sequence row stored in the shard
+    itself and bumped in the same transaction as the insert, so IDs are unique across shards and encode the shard
+    they were created on. Users are spread round-robin over the shards and every item lives on the shard of its
+    owner. Change log entries are written to the shard of the row they describe, so they commit atomically with
+    it.
+
+    Each shard only enforces unique usernames and emails among its own users, so writes that set them hold
+    ``unique_lock``, the write lock of the ``main`` database shared by every worker, while they check the other
+    shards and commit.
+    """
+
+    def __init__(self, urls: list[str], main: AsyncEngine | None = None):
+        self.urls = urls
+        self.main = main
+        self.count = len(urls)
+        self.shard_ids = [str(index) for index in range(self.count)]
+        self.engines: dict[str, AsyncEngine] = {}
+        for shard_id, url in zip(self.shard_ids, urls):
+            shard_engine = create_async_engine(
+                url,
+                echo=settings.DEBUG,
+                connect_args={"check_same_thread": settings.CHECK_SAME_THREAD},
+            )
+            if shard_engine.dialect.name == "sqlite":
+                install_interrupt_handler(shard_engine)
+            self.engines[shard_id] = shard_engine
+        self._next_user_shard = itertools.cycle(self.shard_ids)
+
+    def shard_for(self, key: int) -> str:
+        """Return the shard holding the user with the given ID, or an item created with the given ID."""
+        return self.shard_ids[key % self.count]
+
+    def session(self, **kwargs: Any) -> AsyncSession:
+        """Create an AsyncSession spanning all shards."""
+        session = AsyncSession(
+            sync_session_class=_ShardedSession,
+            shards={shard_id: shard_engine.sync_engine for shard_id, shard_engine in self.engines.items()},
+            shard_chooser=self.shard_chooser,
+            identity_chooser=self.identity_chooser,
+            execute_chooser=self.execute_chooser,
+            **kwargs,
+        )
+        session.info["shard_router"] = self
+        return session
+
+    def shard_chooser(self, mapper, instance, clause=None) -> str:
+        if isinstance(instance, User):
+            return self.shard_for(instance.id)
+        if isinstance(instance, Item):
+            return self.shard_for(instance.owner_id)
+        if isinstance(instance, Change):
+            if instance.entity == "item":
+                return self.shard_for(instance.data["owner_id"])
+            return self.shard_for(instance.entity_id)
+        raise ValueError(f"Cannot choose a shard for {instance!r}")
+
+    def identity_chooser(self, mapper, primary_key, *, lazy_loaded_from, **kwargs) -> list[str]:
+        if mapper.class_ is Change:
+            return self.shard_ids
+        preferred = self.shard_for(primary_key[0])
+        if mapper.class_ is User:
+            return [preferred]
+        # items copied from a single database keep their IDs, so fall back to the other shards
+        return [preferred] + [shard_id for shard_id in self.shard_ids if shard_id != preferred]
+
+    def execute_chooser(self, context: ORMExecuteState) -> list[str]:
+        if context.is_insert:
+            raise ValueError("Sharded inserts must name their shard with bind_arguments={'shard_id': ...}")
+        if context.is_select and context.lazy_loaded_from is not None:
+            return [context.lazy_loaded_from.identity_token]
+        shards = self._route_where(getattr(context.statement, "whereclause", None))
+        return sorted(shards) if shards is not None else self.shard_ids
+
+    def _route_where(self, whereclause: ColumnElement | None) -> set[str] | None:
+        """Return the shards matched by ``user.id``/``item.owner_id`` criteria ANDed into a WHERE clause."""
+        if whereclause is None:
+            return None
+        clauses = whereclause.clauses if isinstance(whereclause, BooleanClauseList) else [whereclause]
+        if isinstance(whereclause, BooleanClauseList) and whereclause.operator is not operators.and_:
+            return None
+
+        shards = None
+        for clause in clauses:
+            if not isinstance(clause, BinaryExpression) or not isinstance(clause.right, BindParameter):
+                continue
+            column = clause.left
+            table = getattr(column, "table", None)
+            if not (
+                (table is User.__table__ and column.name == "id")
+                or (table is Item.__table__ and column.name == "owner_id")
+            ):
+                continue
+            value = clause.right.effective_value
+            if value is None:
+                continue
+            if clause.operator is operators.eq:
+                matched = {self.shard_for(value)}
+            elif clause.operator is operators.in_op:
+                matched = {self.shard_for(key) for key in value}
+            else:
+                continue
+            shards = matched if shards is None else shards & matched
+        return shards
+
+    def allocate_ids(self, session: Session, shard_id: str, count: int = 1) -> list[int]:
+        """
+        Allocate IDs on a shard within the session's transaction on that shard.
+
+        Args:
+            session (Session): The sharded session.
+            shard_id (str): The shard the rows will be inserted into.
+            count (int, optional): The number of IDs to allocate. Defaults to 1.
+        Returns:
+            list[int]: The allocated IDs, in increasing order.
+        """
+        connection = session.connection(bind_arguments={"shard_id": shard_id})
+        last = connection.execute(
+            update(sequence_table)
+            .where(sequence_table.c.name == "id")
+            .values(value=sequence_table.c.value + count)
+            .returning(sequence_table.c.value)
+        ).scalar_one()
+        index = self.shard_ids.index(shard_id)
+        return [sequence * self.count + index for sequence in range(last - count + 1, last + 1)]
+
+    @asynccontextmanager
+    async def unique_lock(self) -> AsyncIterator[None]:
+        """Hold the write lock of the main database until the block exits. Without a main database, do nothing."""
+        if self.main is None:
+            yield
+            return
+        async with self.main.begin() as conn:
+            await conn.execute(insert(lock_table).prefix_with("OR REPLACE").values(name="user"))
+            yield
+
+    async def init_shards(self):
+        """Create or upgrade the sharded tables and create the ID sequence on every shard."""
+        if self.main is not None:
+            async with self.main.begin() as conn:
+                await conn.run_sync(lock_metadata.create_all)
+        for shard_engine in self.engines.values():
+            await enable_incremental_vacuum(shard_engine)
+            async with shard_engine.begin() as conn:
+                await conn.run_sync(SQLModel.metadata.create_all, tables=SHARDED_TABLES)
+                await conn.run_sync(upgrade_schema, SHARDED_TABLES)
+                await conn.run_sync(sequence_metadata.create_all)
+                await conn.execute(insert(sequence_table).prefix_with("OR IGNORE").values(name="id", value=0))
+
+    def paths(self) -> list[Path]:
+        return [Path(make_url(url).database) for url in self.urls]
+
+
+@event.listens_for(_ShardedSession, "before_flush")
+def _assign_ids(session: Session, flush_context, instances):
+    router: ShardRouter = session.info["shard_router"]
+    for instance in session.new:
+        if isinstance(instance, User) and instance.id is None:
+            instance.id = router.allocate_ids(session, next(router._next_user_shard))[0]
+        elif isinstance(instance, Item) and instance.id is None:
+            instance.id = router.allocate_ids(session, router.shard_for(instance.owner_id))[0]
+
+
+def rebalance(source: Path, router: ShardRouter, batch_size: int = 10_000):
+    """
+    Copy users and items from a single database file into the shards.
+
+    Users go to shard ``id % N`` and items follow their owner; IDs are kept. The ID sequences are then moved past
+    the largest copied ID so that new rows never collide with copied ones. The change log is not copied. The
+    shards must not receive traffic while this runs.
+
+    Args:
+        source (Path): The single database file to read.
+        router (ShardRouter): The shards to write to.
+        batch_size (int, optional): The number of rows copied per statement. Defaults to 10000.
+    """
+    for shard_path in router.paths():
+        sync_engine = create_engine(f"sqlite:///{shard_path}")
+        SQLModel.metadata.create_all(sync_engine, tables=SHARDED_TABLES)
+        sequence_metadata.create_all(sync_engine)
+        sync_engine.dispose()
+
+    max_id = 0
+    for index, shard_path in enumerate(router.paths()):
+        conn = sqlite3.connect(shard_path)
+        try:
+            conn.execute("ATTACH DATABASE ? AS source", (f"file:{source}?mode=ro",))
+            for table, shard_column in ((User.__table__, "id"), (Item.__table__, "owner_id")):
+                names = ["id"] + [column.name for column in table.columns if column.name != "id"]
+                columns = ", ".join(f'"{name}"' for name in names)
+                last = -1
+                while True:
+                    rows = conn.execute(
+                        f'SELECT {columns} FROM source."{table.name}" WHERE "{shard_column}" % ? = ? AND id > ? '
+                        f"ORDER BY id LIMIT ?",
+                        (router.count, index, last, batch_size),
+                    ).fetchall()
+                    if not rows:
+                        break
+                    placeholders = ", ".join("?" for _ in names)
+                    conn.executemany(f'INSERT INTO "{table.name}" ({columns}) VALUES ({placeholders})', rows)
+                    conn.commit()
+                    last = rows[-1][0]
+                    max_id = max(max_id, last)
+                logger.info(f"Copied {table.name} rows into shard {index}")
+            conn.commit()
+            conn.execute("DETACH DATABASE source")
+        finally:
+            conn.close()
+
+    for shard_path in router.paths():
+        conn = sqlite3.connect(shard_path)
+        try:
+            conn.execute(
+                "INSERT INTO shard_sequence (name, value) VALUES ('id', ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = max(value, excluded.value)",
+                (max_id // router.count + 1,),
+            )
+            conn.commit()
+        finally:
+            conn.close()
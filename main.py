@@ -3,11 +3,20 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from core.admission import AdmissionControlMiddleware
+from core.bloom import user_filter
+from core.cache import read_cache
+from core.changefeed import change_broadcaster
+from core.compression import CompressionMiddleware
 from core.config import settings
 from core.database import init_db
+from core.deadline import DeadlineMiddleware
 from core.exceptions import configure_exception_handlers
+from core.idempotency import IdempotencyMiddleware
+from core.jobs import job_runner
 from core.logging import logger
-from routers import item, user
+from core.purge import tombstone_purger
+from routers import admin, health, item, job, user
 
 
 @asynccontextmanager
@@ -15,12 +24,24 @@ async def lifespan(app: FastAPI):
     logger.info("Starting up application")
     await init_db()
     logger.info("Database tables created")
+    await user_filter.start()
+    await job_runner.start()
+    await tombstone_purger.start()
+    await read_cache.start()
     yield
     logger.info("Shutting down application")
+    await read_cache.stop()
+    await tombstone_purger.stop()
+    await job_runner.stop()
+    await user_filter.stop()
+    await change_broadcaster.close()
 
 
 app = FastAPI(title=settings.APP_TITLE, version=settings.VERSION, lifespan=lifespan)
 
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
@@ -28,9 +49,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
 
 app.include_router(user.router, prefix="/users", tags=["users"])
 app.include_router(item.router, prefix="/items", tags=["items"])
+app.include_router(job.router, prefix="/jobs", tags=["jobs"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
+app.include_router(health.router, prefix="/health", tags=["health"])
 
 configure_exception_handlers(app)
 
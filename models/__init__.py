@@ -1,5 +1,35 @@
-from .item import Item, ItemBase, ItemCreate, ItemPublic, ItemUpdate
-from .user import User, UserBase, UserCreate, UserPublic, UserUpdate
+from .bulk import BulkResult
+from .change import Change, ChangeBase, ChangePublic
+from .item import (
+    Item,
+    ItemBase,
+    ItemBulkDelete,
+    ItemBulkUpdate,
+    ItemCreate,
+    ItemFilter,
+    ItemImport,
+    ItemPublic,
+    ItemUpdate,
+)
+from .job import (
+    BulkDeleteParams,
+    BulkImportParams,
+    Job,
+    JobBase,
+    JobCreate,
+    JobInput,
+    JobPublic,
+)
+from .user import (
+    User,
+    UserBase,
+    UserBulkDelete,
+    UserBulkUpdate,
+    UserCreate,
+    UserFilter,
+    UserPublic,
+    UserUpdate,
+)
 
 __all__ = [
     "User",
@@ -7,9 +37,27 @@ __all__ = [
     "UserPublic",
     "UserCreate",
     "UserUpdate",
+    "UserFilter",
+    "UserBulkUpdate",
+    "UserBulkDelete",
     "Item",
     "ItemBase",
     "ItemPublic",
     "ItemCreate",
+    "ItemImport",
     "ItemUpdate",
+    "ItemFilter",
+    "ItemBulkUpdate",
+    "ItemBulkDelete",
+    "Change",
+    "ChangeBase",
+    "ChangePublic",
+    "Job",
+    "JobBase",
+    "JobCreate",
+    "JobInput",
+    "JobPublic",
+    "BulkDeleteParams",
+    "BulkImportParams",
+    "BulkResult",
 ]
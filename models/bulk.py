@@ -0,0 +1,41 @@
+from pydantic import model_validator
+from sqlmodel import SQLModel
+
+
+class BulkTarget(SQLModel):
+    """The rows a bulk operation applies to: a list of IDs, or a ``filter`` declared by subclasses."""
+
+    ids: list[int] = []
+
+    @model_validator(mode="after")
+    def check_target(self):
+        target_filter = getattr(self, "filter", None)
+        criteria = target_filter.model_dump(exclude_none=True) if target_filter is not None else {}
+        if bool(self.ids) == bool(criteria):
+            raise ValueError("Exactly one of ids or a non-empty filter is required")
+        values = getattr(self, "values", None)
+        if values is not None and not values.model_dump(exclude_unset=True):
+            raise ValueError("At least one value to update is required")
+        return self
+
+
+class BulkResult(SQLModel):
+    counts: dict[str, int]
+    outcomes: dict[int, str]
+
+    @classmethod
+    def from_ids(cls, requested: list[int], affected: list[int], outcome: str) -> "BulkResult":
+        """
+        Build the result of a bulk operation.
+
+        Args:
+            requested (list[int]): The IDs sent by the client, empty for a filter.
+            affected (list[int]): The IDs of the rows changed.
+            outcome (str): The outcome of the changed rows, e.g. ``"updated"``.
+        Returns:
+            BulkResult: The outcome per ID, requested IDs that matched no live row being ``"not_found"``.
+        """
+        outcomes = dict.fromkeys(affected, outcome)
+        missing = [row_id for row_id in dict.fromkeys(requested) if row_id not in outcomes]
+        outcomes.update(dict.fromkeys(missing, "not_found"))
+        return cls(counts={outcome: len(affected), "not_found": len(missing)}, outcomes=outcomes)
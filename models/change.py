@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+
+from sqlmodel import JSON, Field, SQLModel
+
+
+class ChangeBase(SQLModel):
+    entity: str = Field(index=True)
+    entity_id: int
+    op: str
+    data: dict | None = Field(default=None, sa_type=JSON)
+
+
+class Change(ChangeBase, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
+
+
+class ChangePublic(ChangeBase):
+    id: int
+    created_at: datetime
+    cursor: str | None = None
@@ -1,7 +1,12 @@
+from datetime import datetime
 from typing import TYPE_CHECKING
 
+from pydantic import model_validator
+from sqlalchemy import Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
+from .bulk import BulkTarget
+
 if TYPE_CHECKING:
     from .user import User
 
@@ -12,8 +17,15 @@ class ItemBase(SQLModel):
 
 
 class Item(ItemBase, table=True):
+    __table_args__ = (
+        Index("ix_item_live", "id", sqlite_where=text("deleted_at IS NULL")),
+        Index("ix_item_owner_id_live", "owner_id", sqlite_where=text("deleted_at IS NULL")),
+        Index("ix_item_deleted_at", "deleted_at", sqlite_where=text("deleted_at IS NOT NULL")),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     owner_id: int = Field(foreign_key="user.id", ondelete="CASCADE")
+    deleted_at: datetime | None = None
     owner: "User" = Relationship(back_populates="items")
 
 
@@ -29,3 +41,27 @@ class ItemCreate(ItemBase):
 class ItemUpdate(ItemBase):
     title: str | None = None
     description: str | None = None
+
+    @model_validator(mode="after")
+    def check_not_null(self):
+        # the title may be left out, but the column does not accept null
+        if "title" in self.model_fields_set and self.title is None:
+            raise ValueError("title cannot be null")
+        return self
+
+
+class ItemImport(ItemBase):
+    owner_id: int
+
+
+class ItemFilter(SQLModel):
+    owner_id: int | None = None
+    title: str | None = None
+
+
+class ItemBulkDelete(BulkTarget):
+    filter: ItemFilter | None = None
+
+
+class ItemBulkUpdate(ItemBulkDelete):
+    values: ItemUpdate
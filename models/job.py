@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+from typing import Literal
+
+from pydantic import model_validator
+from sqlmodel import JSON, Field, SQLModel
+
+from .item import ItemImport
+
+
+class BulkDeleteParams(SQLModel):
+    user_id: int | None = None
+    item_ids: list[int] = []
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if (self.user_id is None) == (not self.item_ids):
+            raise ValueError("Exactly one of user_id or item_ids is required")
+        return self
+
+
+class BulkImportParams(SQLModel):
+    items: list[ItemImport]
+
+
+class ReindexParams(SQLModel):
+    pass
+
+
+JOB_PARAMS: dict[str, type[SQLModel]] = {
+    "bulk_delete": BulkDeleteParams,
+    "bulk_import": BulkImportParams,
+    "reindex": ReindexParams,
+}
+
+
+class JobBase(SQLModel):
+    kind: str = Field(index=True)
+    params: dict = Field(default_factory=dict, sa_type=JSON)
+
+
+class Job(JobBase, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    status: str = Field(default="pending", index=True)
+    progress: int = 0
+    total: int | None = None
+    checkpoint: dict | None = Field(default=None, sa_type=JSON)
+    error: str | None = None
+    owner: str | None = None
+    heartbeat: datetime | None = Field(default=None, index=True)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class JobInput(SQLModel, table=True):
+    """One row of a job's input, stored once when the job is created and read back one chunk at a time."""
+
+    __tablename__ = "job_input"
+
+    job_id: int = Field(foreign_key="job.id", primary_key=True)
+    position: int = Field(primary_key=True)
+    data: dict = Field(sa_type=JSON)
+
+
+class JobPublic(JobBase):
+    id: int
+    status: str
+    progress: int
+    total: int | None
+    error: str | None
+    created_at: datetime
+    updated_at: datetime
+
+
+class JobCreate(JobBase):
+    kind: Literal["bulk_delete", "bulk_import", "reindex"]
+
+    @model_validator(mode="after")
+    def check_params(self):
+        self.params = JOB_PARAMS[self.kind].model_validate(self.params).model_dump()
+        return self
@@ -1,7 +1,12 @@
+from datetime import datetime
 from typing import TYPE_CHECKING
 
+from pydantic import model_validator
+from sqlalchemy import Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
+from .bulk import BulkTarget
+
 if TYPE_CHECKING:
     from .item import Item
 
@@ -12,8 +17,16 @@ class UserBase(SQLModel):
 
 
 class User(UserBase, table=True):
+    __table_args__ = (
+        Index("ix_user_live", "id", sqlite_where=text("deleted_at IS NULL")),
+        Index("ux_user_username_live", "username", unique=True, sqlite_where=text("deleted_at IS NULL")),
+        Index("ux_user_email_live", "email", unique=True, sqlite_where=text("deleted_at IS NULL")),
+        Index("ix_user_deleted_at", "deleted_at", sqlite_where=text("deleted_at IS NOT NULL")),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     password: str
+    deleted_at: datetime | None = None
     items: list["Item"] = Relationship(back_populates="owner", cascade_delete=True)
 
 
@@ -29,3 +42,28 @@ class UserUpdate(UserBase):
     username: str | None = None
     email: str | None = None
     password: str | None = None
+
+    @model_validator(mode="after")
+    def check_not_null(self):
+        # the fields may be left out, but the columns do not accept null
+        nulls = [
+            name
+            for name in ("username", "email", "password")
+            if name in self.model_fields_set and getattr(self, name) is None
+        ]
+        if nulls:
+            raise ValueError(f"{', '.join(nulls)} cannot be null")
+        return self
+
+
+class UserFilter(SQLModel):
+    username: str | None = None
+    email: str | None = None
+
+
+class UserBulkDelete(BulkTarget):
+    filter: UserFilter | None = None
+
+
+class UserBulkUpdate(UserBulkDelete):
+    values: UserUpdate
@@ -1,4 +1,7 @@
+from .admin import router as admin_router
+from .health import router as health_router
 from .item import router as item_router
+from .job import router as job_router
 from .user import router as user_router
 
-__all__ = ["user_router", "item_router"]
+__all__ = ["user_router", "item_router", "admin_router", "job_router", "health_router"]
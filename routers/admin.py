@@ -0,0 +1,57 @@
+from typing import Dict
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+
+from core.backup import BackupStatus, backup_manager
+from core.bloom import FilterStats, user_filter
+from core.exceptions import NotFoundError
+from core.response import StandardResponse
+from utils.dependencies import require_admin
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+class BackupCreate(BaseModel):
+    compress: bool = True
+
+
+@router.post("/backups", response_model=StandardResponse[BackupStatus])
+async def create_backup(backup: BackupCreate) -> StandardResponse[BackupStatus]:
+    """
+    Start an online backup of the database.
+
+    Args:
+        backup (BackupCreate): The backup options.
+    Returns:
+        StandardResponse[BackupStatus]: A standardized response containing the status of the started backup.
+    """
+    status = backup_manager.start(compress=backup.compress)
+    return StandardResponse(status="success", message="Backup started", data=status)
+
+
+@router.get("/backups/{backup_id}", response_model=StandardResponse[BackupStatus])
+async def read_backup(backup_id: str) -> StandardResponse[BackupStatus]:
+    """
+    Read the progress of a backup.
+
+    Args:
+        backup_id (str): The ID of the backup.
+    Returns:
+        StandardResponse[BackupStatus]: A standardized response containing the backup status.
+    """
+    status = backup_manager.get(backup_id)
+    if not status:
+        raise NotFoundError("Backup", backup_id)
+    return StandardResponse(status="success", message="Backup retrieved successfully", data=status)
+
+
+@router.get("/user-filter", response_model=StandardResponse[Dict[str, FilterStats]])
+async def read_user_filter() -> StandardResponse[Dict[str, FilterStats]]:
+    """
+    Read the size and memory usage of the username and email existence filters.
+
+    Returns:
+        StandardResponse[Dict[str, FilterStats]]: A standardized response containing the statistics of each filter.
+    """
+    return StandardResponse(status="success", message="User filter retrieved successfully", data=user_filter.stats())
@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from pydantic import BaseModel
+
+from core.bloom import user_filter
+from core.cache import read_cache
+from core.exceptions import NotReadyError
+from core.response import StandardResponse
+
+router = APIRouter()
+
+
+class Readiness(BaseModel):
+    read_cache: bool
+    user_filter: bool
+
+
+@router.get("/live", response_model=StandardResponse[None])
+async def read_liveness() -> StandardResponse[None]:
+    """
+    Report that the application is running.
+
+    Returns:
+        StandardResponse[None]: A standardized success response.
+    """
+    return StandardResponse(status="success", message="Application is live", data=None)
+
+
+@router.get("/ready", response_model=StandardResponse[Readiness])
+async def read_readiness() -> StandardResponse[Readiness]:
+    """
+    Report whether the application is ready to serve traffic, which is once the read cache is warm and the user
+    existence filters are built.
+
+    Returns:
+        StandardResponse[Readiness]: A standardized response containing the state of each startup step.
+    Raises:
+        NotReadyError: If a startup step has not finished yet.
+    """
+    readiness = Readiness(read_cache=read_cache.ready, user_filter=user_filter.ready)
+    pending = [step for step, ready in readiness if not ready]
+    if pending:
+        raise NotReadyError(f"Application is not ready, waiting for: {', '.join(pending)}")
+    return StandardResponse(status="success", message="Application is ready", data=readiness)
@@ -1,12 +1,28 @@
-from typing import Annotated, Dict, List, Optional
+import uuid
+from pathlib import Path
+from typing import Annotated, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 
+from core.cache import read_cache
+from core.changefeed import event_stream, poll_changes, resume_position
+from core.config import settings
 from core.exceptions import NotFoundError
+from core.fastpath import item_listing
+from core.importer import ImportSummary, ItemImporter, detect_format
 from core.response import StandardResponse
-from models import ItemCreate, ItemPublic, ItemUpdate
+from models import (
+    BulkResult,
+    ChangePublic,
+    ItemBulkDelete,
+    ItemBulkUpdate,
+    ItemCreate,
+    ItemPublic,
+    ItemUpdate,
+)
 from services import ItemService
-from utils.dependencies import get_item_service
+from utils.dependencies import get_item_service, item_service_scope
 
 router = APIRouter()
 
@@ -31,41 +47,143 @@ async def create_item(
     return StandardResponse(status="success", message="Item created successfully", data=new_item)
 
 
+@router.post("/import", response_model=StandardResponse[ImportSummary])
+async def import_items(
+    request: Request,
+    import_format: Annotated[Optional[Literal["csv", "ndjson"]], Query(alias="format")] = None,
+) -> StandardResponse[ImportSummary]:
+    """
+    Import items from a CSV or NDJSON request body, streamed as it is uploaded.
+
+    CSV bodies need a header row naming the ``title``, ``description`` and ``owner_id`` columns. Rejected rows and
+    progress are written to a report file under ``IMPORT_REPORT_DIR``.
+
+    Args:
+        request (Request): The incoming request, whose body is the file to import.
+        import_format (str, optional): ``csv`` or ``ndjson``. Defaults to the format of the ``Content-Type``.
+    Returns:
+        StandardResponse[ImportSummary]: A standardized response containing the import counts and the report path.
+    """
+    import_format = import_format or detect_format(content_type=request.headers.get("content-type"))
+    if import_format is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or set format")
+    report = Path(settings.IMPORT_REPORT_DIR) / f"import-{uuid.uuid4().hex}.jsonl"
+    summary = await ItemImporter(report).run(request.stream(), import_format)
+    return StandardResponse(status="success", message="Items imported successfully", data=summary)
+
+
 @router.get("/", response_model=StandardResponse[List[ItemPublic]])
 async def read_items(
-    item_service: Annotated[ItemService, Depends(get_item_service)],
     offset: int = 0,
     limit: Annotated[int, Query(le=100)] = 100,
+    after_id: Optional[int] = None,
 ) -> StandardResponse[List[ItemPublic]]:
     """
-    Read a list of items.
+    Read a list of items. The database is only queried when the page is not in the read cache.
 
     Args:
-        item_service (ItemService): Dependency injected item service.
         offset (int, optional): The offset to start retrieving items from. Defaults to 0.
         limit (int, optional): The maximum number of items to retrieve. Defaults to 100.
+        after_id (int, optional): Keyset cursor, the ID of the last item of the previous page. Takes precedence
+            over ``offset``. Defaults to None.
     Returns:
         StandardResponse[List[ItemPublic]]: A standardized response containing the list of items.
     """
-    items = await item_service.read_items(offset, limit)
-    return StandardResponse(status="success", message="Items retrieved successfully", data=items)
+    body = read_cache.items.page(offset, limit, after_id)
+    if body is None:
+        async with item_service_scope() as item_service:
+            rows = await item_service.read_item_rows(offset, limit, after_id)
+        body = item_listing.serialize(rows, "Items retrieved successfully")
+    return Response(body, media_type="application/json")
+
+
+@router.get("/changes", response_model=StandardResponse[List[ChangePublic]])
+async def read_item_changes(
+    request: Request,
+    response: Response,
+    last_event_id: Annotated[Optional[str], Header()] = None,
+    timeout: Annotated[float, Query(ge=0, le=60)] = 30,
+) -> StandardResponse[List[ChangePublic]] | StreamingResponse:
+    """
+    Read the item change feed.
+
+    Clients sending ``Accept: text/event-stream`` get a Server-Sent Events stream, other clients get the next
+    batch of changes as a long-poll response. Both resume after the ``cursor`` of the last change received, sent in
+    ``Last-Event-ID``. Long-poll responses also return the position to resume from in a ``Last-Event-ID`` header,
+    which keeps moving while the feed of this entity is idle.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The long-poll response, to set its ``Last-Event-ID`` header.
+        last_event_id (str, optional): The last feed position seen by the client. Defaults to None (new changes only).
+        timeout (float, optional): The number of seconds a long-poll waits for a change. Defaults to 30.
+    Returns:
+        StandardResponse[List[ChangePublic]] | StreamingResponse: The next batch of changes, or an SSE stream.
+    """
+    positions = await resume_position(last_event_id)
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            event_stream(request, "item", positions),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    changes, cursor = await poll_changes("item", positions, timeout)
+    response.headers["Last-Event-ID"] = cursor
+    return StandardResponse(status="success", message="Item changes retrieved successfully", data=changes)
+
+
+@router.patch("/bulk", response_model=StandardResponse[BulkResult])
+async def bulk_update_items(
+    bulk: ItemBulkUpdate,
+    item_service: Annotated[ItemService, Depends(get_item_service)],
+) -> StandardResponse[BulkResult]:
+    """
+    Update many items selected by ID or by filter in one transaction.
+
+    Args:
+        bulk (ItemBulkUpdate): The IDs or filter of the items to update, and the values to set.
+        item_service (ItemService): Dependency injected item service.
+    Returns:
+        StandardResponse[BulkResult]: A standardized response containing the outcome per ID and the counts.
+    """
+    result = await item_service.bulk_update_items(bulk)
+    return StandardResponse(status="success", message="Items updated successfully", data=result)
+
+
+@router.delete("/bulk", response_model=StandardResponse[BulkResult])
+async def bulk_delete_items(
+    bulk: ItemBulkDelete,
+    item_service: Annotated[ItemService, Depends(get_item_service)],
+) -> StandardResponse[BulkResult]:
+    """
+    Delete many items selected by ID or by filter in one transaction.
+
+    Args:
+        bulk (ItemBulkDelete): The IDs or filter of the items to delete.
+        item_service (ItemService): Dependency injected item service.
+    Returns:
+        StandardResponse[BulkResult]: A standardized response containing the outcome per ID and the counts.
+    """
+    result = await item_service.bulk_delete_items(bulk)
+    return StandardResponse(status="success", message="Items deleted successfully", data=result)
 
 
 @router.get("/{item_id}", response_model=StandardResponse[Optional[ItemPublic]])
 async def read_item(
     item_id: int,
-    item_service: Annotated[ItemService, Depends(get_item_service)],
 ) -> StandardResponse[Optional[ItemPublic]]:
     """
-    Read a single item by ID.
+    Read a single item by ID. The database is only queried when the item is not in the read cache.
 
     Args:
         item_id (int): The ID of the item to retrieve.
-        item_service (ItemService): Dependency injected item service.
     Returns:
         StandardResponse[Optional[ItemPublic]]: A standardized response containing the item.
     """
-    item = await item_service.read_item(item_id)
+    item = read_cache.items.get(item_id)
+    if item is None:
+        async with item_service_scope() as item_service:
+            item = await item_service.read_item(item_id)
     if not item:
         raise NotFoundError("Item", item_id)
     return StandardResponse(status="success", message="Item retrieved successfully", data=item)
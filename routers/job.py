@@ -0,0 +1,49 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from core.exceptions import NotFoundError
+from core.response import StandardResponse
+from models import JobCreate, JobPublic
+from services import JobService
+from utils.dependencies import get_job_service
+
+router = APIRouter()
+
+
+@router.post("/", response_model=StandardResponse[JobPublic])
+async def create_job(
+    job: JobCreate,
+    job_service: Annotated[JobService, Depends(get_job_service)],
+) -> StandardResponse[JobPublic]:
+    """
+    Start a background job.
+
+    Args:
+        job (JobCreate): The kind and parameters of the job.
+        job_service (JobService): Dependency injected job service.
+    Returns:
+        StandardResponse[JobPublic]: A standardized response containing the created job.
+    """
+    new_job = await job_service.create_job(job)
+    return StandardResponse(status="success", message="Job created successfully", data=new_job)
+
+
+@router.get("/{job_id}", response_model=StandardResponse[JobPublic])
+async def read_job(
+    job_id: int,
+    job_service: Annotated[JobService, Depends(get_job_service)],
+) -> StandardResponse[JobPublic]:
+    """
+    Read the progress of a job.
+
+    Args:
+        job_id (int): The ID of the job to retrieve.
+        job_service (JobService): Dependency injected job service.
+    Returns:
+        StandardResponse[JobPublic]: A standardized response containing the job.
+    """
+    job = await job_service.read_job(job_id)
+    if not job:
+        raise NotFoundError("Job", job_id)
+    return StandardResponse(status="success", message="Job retrieved successfully", data=job)
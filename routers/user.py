@@ -1,12 +1,25 @@
 from typing import Annotated, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 
+from core.bloom import user_filter
+from core.cache import read_cache
+from core.changefeed import event_stream, poll_changes, resume_position
 from core.exceptions import NotFoundError
+from core.fastpath import user_listing
 from core.response import StandardResponse
-from models import UserCreate, UserPublic, UserUpdate
+from models import (
+    BulkResult,
+    ChangePublic,
+    UserBulkDelete,
+    UserBulkUpdate,
+    UserCreate,
+    UserPublic,
+    UserUpdate,
+)
 from services import UserService
-from utils.dependencies import get_user_service
+from utils.dependencies import get_user_service, user_service_scope
 
 router = APIRouter()
 
@@ -31,39 +44,143 @@ async def create_user(
 
 @router.get("/", response_model=StandardResponse[List[UserPublic]])
 async def read_users(
-    user_service: Annotated[UserService, Depends(get_user_service)],
     offset: int = 0,
     limit: Annotated[int, Query(le=100)] = 100,
+    after_id: Optional[int] = None,
 ) -> StandardResponse[List[UserPublic]]:
     """
-    Read a list of users.
+    Read a list of users. The database is only queried when the page is not in the read cache.
 
     Args:
-        user_service (UserService): Dependency injected user service.
         offset (int, optional): The offset to start retrieving users from. Defaults to 0.
         limit (int, optional): The maximum number of users to retrieve. Defaults to 100.
+        after_id (int, optional): Keyset cursor, the ID of the last user of the previous page. Takes precedence
+            over ``offset``. Defaults to None.
     Returns:
         StandardResponse[List[UserPublic]]: A standardized response containing the list of users.
     """
-    users = await user_service.read_users(offset, limit)
-    return StandardResponse(status="success", message="Users retrieved successfully", data=users)
+    body = read_cache.users.page(offset, limit, after_id)
+    if body is None:
+        async with user_service_scope() as user_service:
+            rows = await user_service.read_user_rows(offset, limit, after_id)
+        body = user_listing.serialize(rows, "Users retrieved successfully")
+    return Response(body, media_type="application/json")
+
+
+@router.get("/changes", response_model=StandardResponse[List[ChangePublic]])
+async def read_user_changes(
+    request: Request,
+    response: Response,
+    last_event_id: Annotated[Optional[str], Header()] = None,
+    timeout: Annotated[float, Query(ge=0, le=60)] = 30,
+) -> StandardResponse[List[ChangePublic]] | StreamingResponse:
+    """
+    Read the user change feed.
+
+    Clients sending ``Accept: text/event-stream`` get a Server-Sent Events stream, other clients get the next
+    batch of changes as a long-poll response. Both resume after the ``cursor`` of the last change received, sent in
+    ``Last-Event-ID``. Long-poll responses also return the position to resume from in a ``Last-Event-ID`` header,
+    which keeps moving while the feed of this entity is idle.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The long-poll response, to set its ``Last-Event-ID`` header.
+        last_event_id (str, optional): The last feed position seen by the client. Defaults to None (new changes only).
+        timeout (float, optional): The number of seconds a long-poll waits for a change. Defaults to 30.
+    Returns:
+        StandardResponse[List[ChangePublic]] | StreamingResponse: The next batch of changes, or an SSE stream.
+    """
+    positions = await resume_position(last_event_id)
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            event_stream(request, "user", positions),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    changes, cursor = await poll_changes("user", positions, timeout)
+    response.headers["Last-Event-ID"] = cursor
+    return StandardResponse(status="success", message="User changes retrieved successfully", data=changes)
+
+
+@router.get("/exists", response_model=StandardResponse[Dict[str, bool]])
+async def user_exists(
+    username: Optional[str] = None,
+    email: Optional[str] = None,
+) -> StandardResponse[Dict[str, bool]]:
+    """
+    Check whether a username or email is already taken. The database is only queried for values that the user
+    filter reports as possibly taken.
+
+    Args:
+        username (str, optional): The username to check. Defaults to None.
+        email (str, optional): The email to check. Defaults to None.
+    Returns:
+        StandardResponse[Dict[str, bool]]: A standardized response mapping each given field to whether it is taken.
+    """
+    if username is None and email is None:
+        raise HTTPException(status_code=422, detail="Either username or email is required")
+    values = {field: value for field, value in (("username", username), ("email", email)) if value is not None}
+    taken = {field: False for field, value in values.items() if not user_filter.might_exist(field, value)}
+    if len(taken) < len(values):
+        async with user_service_scope() as user_service:
+            taken.update(
+                await user_service.user_exists(**{field: values[field] for field in values if field not in taken})
+            )
+    return StandardResponse(status="success", message="User existence checked successfully", data=taken)
+
+
+@router.patch("/bulk", response_model=StandardResponse[BulkResult])
+async def bulk_update_users(
+    bulk: UserBulkUpdate,
+    user_service: Annotated[UserService, Depends(get_user_service)],
+) -> StandardResponse[BulkResult]:
+    """
+    Update many users selected by ID or by filter in one transaction.
+
+    Args:
+        bulk (UserBulkUpdate): The IDs or filter of the users to update, and the values to set.
+        user_service (UserService): Dependency injected user service.
+    Returns:
+        StandardResponse[BulkResult]: A standardized response containing the outcome per ID and the counts.
+    """
+    result = await user_service.bulk_update_users(bulk)
+    return StandardResponse(status="success", message="Users updated successfully", data=result)
+
+
+@router.delete("/bulk", response_model=StandardResponse[BulkResult])
+async def bulk_delete_users(
+    bulk: UserBulkDelete,
+    user_service: Annotated[UserService, Depends(get_user_service)],
+) -> StandardResponse[BulkResult]:
+    """
+    Delete many users selected by ID or by filter in one transaction.
+
+    Args:
+        bulk (UserBulkDelete): The IDs or filter of the users to delete.
+        user_service (UserService): Dependency injected user service.
+    Returns:
+        StandardResponse[BulkResult]: A standardized response containing the outcome per ID and the counts.
+    """
+    result = await user_service.bulk_delete_users(bulk)
+    return StandardResponse(status="success", message="Users deleted successfully", data=result)
 
 
 @router.get("/{user_id}", response_model=StandardResponse[Optional[UserPublic]])
 async def read_user(
     user_id: int,
-    user_service: Annotated[UserService, Depends(get_user_service)],
 ) -> StandardResponse[Optional[UserPublic]]:
     """
-    Read a single user by ID.
+    Read a single user by ID. The database is only queried when the user is not in the read cache.
 
     Args:
         user_id (int): The ID of the user to retrieve.
-        user_service (UserService): Dependency injected user service.
     Returns:
         StandardResponse[Optional[UserPublic]]: A standardized response containing the user.
     """
-    user = await user_service.read_user(user_id)
+    user = read_cache.users.get(user_id)
+    if user is None:
+        async with user_service_scope() as user_service:
+            user = await user_service.read_user(user_id)
     if not user:
         raise NotFoundError("User", user_id)
     return StandardResponse(status="success", message="User retrieved successfully", data=user)
@@ -1,4 +1,5 @@
 from .item import ItemService
+from .job import JobService
 from .user import UserService
 
-__all__ = ["UserService", "ItemService"]
+__all__ = ["UserService", "ItemService", "JobService"]
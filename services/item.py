@@ -1,10 +1,26 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Row, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
+from core.changefeed import change_broadcaster, record_change
+from core.config import settings
+from core.deadline import check_deadline
 from core.exceptions import NotFoundError
+from core.fastpath import item_listing
 from core.logging import logger
-from models import Item, ItemCreate, ItemUpdate, User
+from models import (
+    BulkResult,
+    Item,
+    ItemBulkDelete,
+    ItemBulkUpdate,
+    ItemCreate,
+    ItemPublic,
+    ItemUpdate,
+    User,
+)
 
 
 class ItemService:
@@ -21,41 +37,48 @@ class ItemService:
         Returns:
             Item: The created item.
         """
+        check_deadline()
         try:
             owner = await self.session.get(User, owner_id)
-            if not owner:
+            if not owner or owner.deleted_at is not None:
                 logger.warning(f"User not found with ID: {owner_id}")
                 raise NotFoundError("User", owner_id)
 
             db_item = Item(owner_id=owner_id, **item.model_dump(exclude_unset=True))
             self.session.add(db_item)
+            await self.session.flush()
+            record_change(self.session, "item", "create", db_item.id, ItemPublic.model_validate(db_item))
             await self.session.commit()
             await self.session.refresh(db_item)
+            change_broadcaster.notify()
             logger.info(f"Item created: {db_item}")
             return db_item
         except SQLAlchemyError as e:
             await self.session.rollback()
             logger.error(f"Failed to create item: {e}")
+            check_deadline()
             raise
 
-    async def read_items(self, offset: int = 0, limit: int = 100) -> list[Item]:
+    async def read_item_rows(self, offset: int = 0, limit: int = 100, after_id: int | None = None) -> list[Row]:
         """
-        Retrieve a list of items.
+        Read a page of items as row tuples of their public columns, bypassing the ORM.
 
         Args:
             offset (int, optional): The offset for pagination. Defaults to 0.
             limit (int, optional): The limit for pagination. Defaults to 100.
+            after_id (int | None, optional): The ID of the last item of the previous page. Takes precedence over
+                ``offset``. Defaults to None.
         Returns:
-            list[Item]: A list of items.
+            list[Row]: The rows, in the field order of ``ItemPublic``.
         """
+        check_deadline()
         try:
-            query = select(Item).order_by(Item.id).offset(offset).limit(limit)
-            result = await self.session.execute(query)
-            items = result.scalars().all()
-            logger.info(f"Items retrieved: {items}")
-            return items
+            rows = await item_listing.fetch(self.session, offset, limit, after_id)
+            logger.info(f"Item rows retrieved: {len(rows)}")
+            return rows
         except SQLAlchemyError as e:
             logger.error(f"Failed to retrieve items: {e}")
+            check_deadline()
             raise
 
     async def read_item(self, item_id: int) -> Item | None:
@@ -67,15 +90,17 @@ class ItemService:
         Returns:
             Item | None: The item if found, otherwise None.
         """
+        check_deadline()
         try:
             item = await self.session.get(Item, item_id)
-            if not item:
+            if not item or item.deleted_at is not None:
                 logger.warning(f"Item not found with ID: {item_id}")
-            else:
-                logger.info(f"Item retrieved: {item}")
+                return None
+            logger.info(f"Item retrieved: {item}")
             return item
         except SQLAlchemyError as e:
             logger.error(f"Failed to retrieve item: {e}")
+            check_deadline()
             raise
 
     async def update_item(self, item_id: int, item: ItemUpdate) -> Item:
@@ -88,9 +113,10 @@ class ItemService:
         Returns:
             Item: The updated item.
         """
+        check_deadline()
         try:
             item_db = await self.session.get(Item, item_id)
-            if not item_db:
+            if not item_db or item_db.deleted_at is not None:
                 logger.warning(f"Item not found with ID: {item_id}")
                 raise NotFoundError("Item", item_id)
 
@@ -98,35 +124,115 @@ class ItemService:
             for key, value in item_data.items():
                 setattr(item_db, key, value)
             self.session.add(item_db)
+            record_change(self.session, "item", "update", item_id, ItemPublic.model_validate(item_db))
             await self.session.commit()
             await self.session.refresh(item_db)
+            change_broadcaster.notify()
             logger.info(f"Item updated: {item_db}")
             return item_db
         except SQLAlchemyError as e:
             await self.session.rollback()
             logger.error(f"Failed to update item: {e}")
+            check_deadline()
             raise
 
     async def delete_item(self, item_id: int) -> dict:
         """
-        Delete an item.
+        Delete an item, leaving a tombstone that is purged in the background.
 
         Args:
             item_id (int): The ID of the item to delete.
         Returns:
             dict: A dictionary indicating the success of the deletion.
         """
+        check_deadline()
         try:
             item = await self.session.get(Item, item_id)
-            if not item:
+            if not item or item.deleted_at is not None:
                 logger.warning(f"Item not found with ID: {item_id}")
                 raise NotFoundError("Item", item_id)
 
-            await self.session.delete(item)
+            item.deleted_at = datetime.now(timezone.utc)
+            record_change(self.session, "item", "delete", item_id, ItemPublic.model_validate(item))
             await self.session.commit()
+            change_broadcaster.notify()
             logger.info(f"Item deleted with ID: {item_id}")
             return {"ok": True}
         except SQLAlchemyError as e:
             await self.session.rollback()
             logger.error(f"Failed to delete item: {e}")
+            check_deadline()
+            raise
+
+    async def bulk_update_items(self, bulk: ItemBulkUpdate) -> BulkResult:
+        """
+        Update many items in one transaction.
+
+        Args:
+            bulk (ItemBulkUpdate): The IDs or filter of the items to update, and the values to set.
+        Returns:
+            BulkResult: The outcome per item ID and the number of items per outcome.
+        """
+        check_deadline()
+        try:
+            rows = await self._bulk_update(bulk, bulk.values.model_dump(exclude_unset=True))
+            for row in rows:
+                record_change(self.session, "item", "update", row.id, ItemPublic.model_validate(row))
+            await self.session.commit()
+            change_broadcaster.notify()
+            logger.info(f"Items updated: {len(rows)}")
+            return BulkResult.from_ids(bulk.ids, [row.id for row in rows], "updated")
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Failed to update items: {e}")
+            check_deadline()
             raise
+
+    async def bulk_delete_items(self, bulk: ItemBulkDelete) -> BulkResult:
+        """
+        Delete many items in one transaction, leaving tombstones that are purged in the background.
+
+        Args:
+            bulk (ItemBulkDelete): The IDs or filter of the items to delete.
+        Returns:
+            BulkResult: The outcome per item ID and the number of items per outcome.
+        """
+        check_deadline()
+        try:
+            rows = await self._bulk_update(bulk, {"deleted_at": datetime.now(timezone.utc)})
+            for row in rows:
+                record_change(self.session, "item", "delete", row.id, ItemPublic.model_validate(row))
+            await self.session.commit()
+            change_broadcaster.notify()
+            logger.info(f"Items deleted: {len(rows)}")
+            return BulkResult.from_ids(bulk.ids, [row.id for row in rows], "deleted")
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Failed to delete items: {e}")
+            check_deadline()
+            raise
+
+    async def _bulk_update(self, bulk: ItemBulkDelete, values: dict) -> list[Row]:
+        """Run a set-based UPDATE of live items, in chunks of ``BULK_CHUNK_SIZE`` IDs, returning the new rows."""
+        statement = (
+            update(Item)
+            .where(Item.deleted_at.is_(None))
+            .values(**values)
+            .returning(Item.id, Item.title, Item.description, Item.owner_id)
+            .execution_options(synchronize_session=False)
+        )
+        if not bulk.ids:
+            criteria = bulk.filter.model_dump(exclude_none=True)
+            result = await self.session.execute(
+                statement.where(*(getattr(Item, key) == value for key, value in criteria.items()))
+            )
+            return result.all()
+
+        rows = []
+        for start in range(0, len(bulk.ids), settings.BULK_CHUNK_SIZE):
+            check_deadline()
+            result = await self.session.execute(
+                statement.where(Item.id.in_(bulk.ids[start : start + settings.BULK_CHUNK_SIZE]))
+            )
+            rows.extend(result.all())
+        return rows
@@ -0,0 +1,65 @@
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.jobs import job_runner
+from core.logging import logger
+from models import Job, JobCreate, JobInput
+
+
+class JobService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create_job(self, job: JobCreate) -> Job:
+        """
+        Create a job and queue it for the background runner.
+
+        The items of a bulk import are stored once as ``JobInput`` rows instead of in the job's parameters, which
+        only keep their count.
+
+        Args:
+            job (JobCreate): The job to create.
+        Returns:
+            Job: The created job.
+        """
+        try:
+            db_job = Job.model_validate(job)
+            inputs = []
+            if db_job.kind == "bulk_import":
+                inputs = db_job.params["items"]
+                db_job.params = {"count": len(inputs)}
+            self.session.add(db_job)
+            if inputs:
+                await self.session.flush()
+                await self.session.execute(
+                    insert(JobInput),
+                    [{"job_id": db_job.id, "position": position, "data": data} for position, data in enumerate(inputs)],
+                )
+            await self.session.commit()
+            await self.session.refresh(db_job)
+            job_runner.enqueue(db_job.id)
+            logger.info(f"Job created: {db_job}")
+            return db_job
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Failed to create job: {e}")
+            raise
+
+    async def read_job(self, job_id: int) -> Job | None:
+        """
+        Retrieve a job by ID.
+
+        Args:
+            job_id (int): The ID of the job to retrieve.
+        Returns:
+            Job | None: The job if found, otherwise None.
+        """
+        try:
+            job = await self.session.get(Job, job_id)
+            if not job:
+                logger.warning(f"Job not found with ID: {job_id}")
+            return job
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to retrieve job: {e}")
+            raise
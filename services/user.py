@@ -1,11 +1,31 @@
+from contextlib import AbstractAsyncContextManager, nullcontext
+from datetime import datetime, timezone
+
 from fastapi import HTTPException, status
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import Executable, Row, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
-from core.exceptions import NotFoundError
+from core.bloom import user_filter
+from core.changefeed import change_broadcaster, record_change
+from core.config import settings
+from core.deadline import check_deadline
+from core.exceptions import ConflictError, NotFoundError
+from core.fastpath import user_listing
 from core.logging import logger
-from models import User, UserCreate, UserUpdate
+from core.sharding import ShardRouter
+from models import (
+    BulkResult,
+    Item,
+    ItemPublic,
+    User,
+    UserBulkDelete,
+    UserBulkUpdate,
+    UserCreate,
+    UserPublic,
+    UserUpdate,
+)
 
 
 class UserService:
@@ -21,36 +41,51 @@ class UserService:
         Returns:
             User: The created user.
         """
+        check_deadline()
         try:
-            db_user = User(**user.model_dump(exclude_unset=True))
-            self.session.add(db_user)
-            await self.session.commit()
+            values = user.model_dump(include={"username", "email"})
+            async with self._unique_lock(values):
+                await self._check_available(values)
+                db_user = User(**user.model_dump(exclude_unset=True))
+                self.session.add(db_user)
+                await self.session.flush()
+                record_change(self.session, "user", "create", db_user.id, UserPublic.model_validate(db_user))
+                await self.session.commit()
             await self.session.refresh(db_user)
+            await user_filter.sync()
+            change_broadcaster.notify()
             logger.info(f"User created: {db_user}")
             return db_user
+        except IntegrityError as e:
+            await self.session.rollback()
+            logger.warning(f"Failed to create user: {e}")
+            raise ConflictError("Username or email already exists")
         except SQLAlchemyError as e:
             await self.session.rollback()
             logger.error(f"Failed to create user: {e}")
+            check_deadline()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
 
-    async def read_users(self, offset: int = 0, limit: int = 100) -> list[User]:
+    async def read_user_rows(self, offset: int = 0, limit: int = 100, after_id: int | None = None) -> list[Row]:
         """
-        Read a list of users.
+        Read a page of users as row tuples of their public columns, bypassing the ORM.
 
         Args:
-            offset (int, optional): The offset to start retrieving users from. Defaults to 0.
-            limit (int, optional): The maximum number of users to retrieve. Defaults to 100.
+            offset (int, optional): The offset for pagination. Defaults to 0.
+            limit (int, optional): The limit for pagination. Defaults to 100.
+            after_id (int | None, optional): The ID of the last user of the previous page. Takes precedence over
+                ``offset``. Defaults to None.
         Returns:
-            list[User]: The list of users retrieved.
+            list[Row]: The rows, in the field order of ``UserPublic``.
         """
+        check_deadline()
         try:
-            query = select(User).order_by(User.id).offset(offset).limit(limit)
-            result = await self.session.execute(query)
-            users = result.scalars().all()
-            logger.info(f"Users retrieved: {users}")
-            return users
+            rows = await user_listing.fetch(self.session, offset, limit, after_id)
+            logger.info(f"User rows retrieved: {len(rows)}")
+            return rows
         except SQLAlchemyError as e:
             logger.error(f"Failed to retrieve users: {e}")
+            check_deadline()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
 
     async def read_user(self, user_id: int) -> User | None:
@@ -62,15 +97,17 @@ class UserService:
         Returns:
             User | None: The user retrieved, or None if not found.
         """
+        check_deadline()
         try:
             user = await self.session.get(User, user_id)
-            if not user:
+            if not user or user.deleted_at is not None:
                 logger.warning(f"User not found with ID: {user_id}")
                 return None
             logger.info(f"User retrieved: {user}")
             return user
         except SQLAlchemyError as e:
             logger.error(f"Failed to retrieve user: {e}")
+            check_deadline()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
 
     async def update_user(self, user_id: int, user_update: UserUpdate) -> User:
@@ -83,43 +120,227 @@ class UserService:
         Returns:
             User: The updated user.
         """
+        check_deadline()
         try:
-            user_db = await self.session.get(User, user_id)
-            if not user_db:
-                logger.warning(f"User not found with ID: {user_id}")
-                raise NotFoundError("User", user_id)
             user_data = user_update.model_dump(exclude_unset=True)
-            for key, value in user_data.items():
-                setattr(user_db, key, value)
-            self.session.add(user_db)
-            await self.session.commit()
+            values = {key: value for key, value in user_data.items() if key in user_filter.fields and value is not None}
+            async with self._unique_lock(values):
+                user_db = await self.session.get(User, user_id)
+                if not user_db or user_db.deleted_at is not None:
+                    logger.warning(f"User not found with ID: {user_id}")
+                    raise NotFoundError("User", user_id)
+                previous = UserPublic.model_validate(user_db)
+                await self._check_available(values, exclude_id=user_id)
+                for key, value in user_data.items():
+                    setattr(user_db, key, value)
+                self.session.add(user_db)
+                record_change(self.session, "user", "update", user_id, UserPublic.model_validate(user_db))
+                await self.session.commit()
             await self.session.refresh(user_db)
+            await user_filter.remove([previous])
+            change_broadcaster.notify()
             logger.info(f"User updated: {user_db}")
             return user_db
+        except IntegrityError as e:
+            await self.session.rollback()
+            logger.warning(f"Failed to update user: {e}")
+            raise ConflictError("Username or email already exists")
         except SQLAlchemyError as e:
             await self.session.rollback()
             logger.error(f"Failed to update user: {e}")
+            check_deadline()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
 
     async def delete_user(self, user_id: int) -> dict:
         """
-        Delete a user.
+        Delete a user and their items, leaving tombstones that are purged in the background.
 
         Args:
             user_id (int): The ID of the user to delete.
         Returns:
             dict: A dictionary indicating whether the user was deleted successfully.
         """
+        check_deadline()
         try:
             user = await self.session.get(User, user_id)
-            if not user:
+            if not user or user.deleted_at is not None:
                 logger.warning(f"User not found with ID: {user_id}")
                 raise NotFoundError("User", user_id)
-            await self.session.delete(user)
+            deleted_at = datetime.now(timezone.utc)
+            items = await self.session.execute(
+                update(Item)
+                .where(Item.owner_id == user_id, Item.deleted_at.is_(None))
+                .values(deleted_at=deleted_at)
+                .returning(Item.id, Item.title, Item.description, Item.owner_id)
+            )
+            for item in items:
+                record_change(self.session, "item", "delete", item.id, ItemPublic.model_validate(item))
+            user.deleted_at = deleted_at
+            record_change(self.session, "user", "delete", user_id)
             await self.session.commit()
+            await user_filter.remove([user])
+            change_broadcaster.notify()
             logger.info(f"User deleted with ID: {user_id}")
             return {"ok": True}
         except SQLAlchemyError as e:
             await self.session.rollback()
             logger.error(f"Failed to delete user: {e}")
+            check_deadline()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+
+    async def bulk_update_users(self, bulk: UserBulkUpdate) -> BulkResult:
+        """
+        Update many users in one transaction.
+
+        Args:
+            bulk (UserBulkUpdate): The IDs or filter of the users to update, and the values to set.
+        Returns:
+            BulkResult: The outcome per user ID and the number of users per outcome.
+        """
+        check_deadline()
+        try:
+            values = bulk.values.model_dump(exclude_unset=True)
+            unique = {key: value for key, value in values.items() if key in user_filter.fields and value is not None}
+            async with self._unique_lock(unique):
+                previous = await self._bulk_select(bulk) if unique else None
+                rows = await self._bulk_update(bulk, values)
+                for field, value in unique.items():
+                    if rows and (len(rows) > 1 or await self._taken(field, value, rows[0].id, exact=True)):
+                        await self.session.rollback()
+                        logger.warning(f"User with {field} already exists: {value}")
+                        raise ConflictError(f"User with {field} already exists: {value}")
+                for row in rows:
+                    record_change(self.session, "user", "update", row.id, UserPublic.model_validate(row))
+                await self.session.commit()
+            # the new values are added from the change log, the old ones were added when they were written
+            await user_filter.remove(previous if previous is not None else rows)
+            change_broadcaster.notify()
+            logger.info(f"Users updated: {len(rows)}")
+            return BulkResult.from_ids(bulk.ids, [row.id for row in rows], "updated")
+        except IntegrityError as e:
+            await self.session.rollback()
+            logger.warning(f"Failed to update users: {e}")
+            raise ConflictError("Username or email already exists")
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Failed to update users: {e}")
+            check_deadline()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+
+    async def bulk_delete_users(self, bulk: UserBulkDelete) -> BulkResult:
+        """
+        Delete many users and their items in one transaction, leaving tombstones that are purged in the background.
+
+        Args:
+            bulk (UserBulkDelete): The IDs or filter of the users to delete.
+        Returns:
+            BulkResult: The outcome per user ID and the number of users per outcome.
+        """
+        check_deadline()
+        try:
+            deleted_at = datetime.now(timezone.utc)
+            rows = await self._bulk_update(bulk, {"deleted_at": deleted_at})
+            user_ids = [row.id for row in rows]
+            for start in range(0, len(user_ids), settings.BULK_CHUNK_SIZE):
+                items = await self.session.execute(
+                    update(Item)
+                    .where(Item.owner_id.in_(user_ids[start : start + settings.BULK_CHUNK_SIZE]))
+                    .where(Item.deleted_at.is_(None))
+                    .values(deleted_at=deleted_at)
+                    .returning(Item.id, Item.title, Item.description, Item.owner_id)
+                    .execution_options(synchronize_session=False)
+                )
+                for item in items:
+                    record_change(self.session, "item", "delete", item.id, ItemPublic.model_validate(item))
+            for row in rows:
+                record_change(self.session, "user", "delete", row.id)
+            await self.session.commit()
+            await user_filter.remove(rows)
+            change_broadcaster.notify()
+            logger.info(f"Users deleted: {len(rows)}")
+            return BulkResult.from_ids(bulk.ids, user_ids, "deleted")
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Failed to delete users: {e}")
+            check_deadline()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+
+    async def _bulk_update(self, bulk: UserBulkDelete, values: dict) -> list[Row]:
+        """Run a set-based UPDATE of live users, in chunks of ``BULK_CHUNK_SIZE`` IDs, returning the new rows."""
+        statement = (
+            update(User)
+            .where(User.deleted_at.is_(None))
+            .values(**values)
+            .returning(User.id, User.username, User.email)
+            .execution_options(synchronize_session=False)
+        )
+        return await self._bulk_execute(bulk, statement)
+
+    async def _bulk_select(self, bulk: UserBulkDelete) -> list[Row]:
+        """Read the live users targeted by a bulk request, in chunks of ``BULK_CHUNK_SIZE`` IDs."""
+        return await self._bulk_execute(
+            bulk, select(User.id, User.username, User.email).where(User.deleted_at.is_(None))
+        )
+
+    async def _bulk_execute(self, bulk: UserBulkDelete, statement: Executable) -> list[Row]:
+        if not bulk.ids:
+            criteria = bulk.filter.model_dump(exclude_none=True)
+            result = await self.session.execute(
+                statement.where(*(getattr(User, key) == value for key, value in criteria.items()))
+            )
+            return result.all()
+
+        rows = []
+        for start in range(0, len(bulk.ids), settings.BULK_CHUNK_SIZE):
+            check_deadline()
+            result = await self.session.execute(
+                statement.where(User.id.in_(bulk.ids[start : start + settings.BULK_CHUNK_SIZE]))
+            )
+            rows.extend(result.all())
+        return rows
+
+    async def user_exists(self, username: str | None = None, email: str | None = None) -> dict[str, bool]:
+        """
+        Check whether usernames or emails are taken by a live user.
+
+        Values that the in-memory filter has never seen are reported as free without querying the database.
+
+        Args:
+            username (str | None, optional): The username to check. Defaults to None.
+            email (str | None, optional): The email to check. Defaults to None.
+        Returns:
+            dict[str, bool]: Whether each given value is taken, keyed by field.
+        """
+        check_deadline()
+        try:
+            values = {"username": username, "email": email}
+            return {field: await self._taken(field, value) for field, value in values.items() if value is not None}
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to check user existence: {e}")
+            check_deadline()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+
+    async def _taken(self, field: str, value: str, exclude_id: int | None = None, exact: bool = False) -> bool:
+        if not exact and not user_filter.might_exist(field, value):
+            return False
+        column = getattr(User, field)
+        statement = select(User.id).where(column == value, User.deleted_at.is_(None))
+        if exclude_id is not None:
+            statement = statement.where(User.id != exclude_id)
+        result = await self.session.execute(statement.limit(1))
+        return result.first() is not None
+
+    def _unique_lock(self, values: dict[str, str]) -> AbstractAsyncContextManager:
+        """Serialise a write setting usernames or emails with the other shards, see ``ShardRouter.unique_lock``."""
+        router: ShardRouter | None = self.session.info.get("shard_router")
+        if router is None or not values:
+            return nullcontext()
+        return router.unique_lock()
+
+    async def _check_available(self, values: dict[str, str], exclude_id: int | None = None):
+        # the filter may lag behind other workers, and across shards this check is all that keeps values unique
+        exact = self.session.info.get("shard_router") is not None
+        for field, value in values.items():
+            if await self._taken(field, value, exclude_id, exact):
+                logger.warning(f"User with {field} already exists: {value}")
+                raise ConflictError(f"User with {field} already exists: {value}")
@@ -0,0 +1,26 @@
+import asyncio
+import sys
+
+import pytest
+
+sys.path.append(".")
+from core.config import settings
+from core.database import engine, init_db
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Create the database before any test, so that clients running without the lifespan work on a fresh checkout"""
+
+    async def create():
+        await init_db()
+        # the pooled connections belong to this event loop
+        await engine.dispose()
+
+    asyncio.run(create())
+
+
+@pytest.fixture(autouse=True)
+def cache_reads_file(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Keep the read counts saved on shutdown out of the working tree"""
+    monkeypatch.setattr(settings, "CACHE_READS_FILE", str(tmp_path / "reads.json"))
@@ -0,0 +1,136 @@
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(".")
+
+import cli
+from core import backup
+from core.backup import database_path, restore_database, shard_snapshot_path
+from core.config import settings
+from main import app
+
+ADMIN_API_KEY = "test-admin-key"
+
+
+@pytest.fixture(autouse=True)
+def admin_api_key(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", ADMIN_API_KEY)
+
+
+@pytest.fixture
+def client():
+    """Run the application lifespan, which creates the database, and return a client for the admin API"""
+    with TestClient(app, headers={"X-API-Key": ADMIN_API_KEY}) as client:
+        yield client
+
+
+def wait_for_backup(client: TestClient, backup_id: str) -> dict:
+    """Poll a backup until it is no longer running and return its status"""
+    for _ in range(100):
+        response = client.get(f"/admin/backups/{backup_id}")
+        assert response.status_code == 200
+        data = response.json()["data"]
+        if data["status"] in ("completed", "failed"):
+            return data
+        time.sleep(0.05)
+    raise AssertionError(f"Backup {backup_id} did not finish")
+
+
+def count_users(path: Path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM user").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_backup_and_restore(client, tmp_path, compress):
+    """Test taking an online backup and restoring it into a new database"""
+    response = client.post("/admin/backups", json={"compress": compress})
+    assert response.status_code == 200
+    assert response.json()["message"] == "Backup started"
+
+    data = wait_for_backup(client, response.json()["data"]["id"])
+    assert data["status"] == "completed"
+    assert data["pages_done"] == data["pages_total"] > 0
+    snapshot = Path(data["path"])
+    assert snapshot.exists()
+    assert snapshot.name.endswith(".gz") == compress
+
+    restored = restore_database(snapshot, tmp_path / "restored.db")
+    assert count_users(restored) == count_users(database_path())
+    snapshot.unlink()
+
+
+def create_database(path: Path, users: int):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE user (id INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE item (id INTEGER PRIMARY KEY)")
+        conn.executemany("INSERT INTO user (id) VALUES (?)", [(i,) for i in range(users)])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_cli_backup_and_restore_shards(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Test that the backup and restore commands cover every shard next to the main database"""
+    main_db, shards = tmp_path / "main.db", [tmp_path / "shard0.db", tmp_path / "shard1.db"]
+    for users, path in enumerate([main_db] + shards):
+        create_database(path, users)
+    router = SimpleNamespace(paths=lambda: shards)
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{main_db}")
+    monkeypatch.setattr(backup, "shard_router", router)
+    monkeypatch.setattr(cli, "shard_router", router)
+
+    snapshot = tmp_path / "backups" / "snapshot.db.gz"
+    snapshot.parent.mkdir()
+    cli.backup(argparse.Namespace(output=snapshot, compress=True, pages=-1, throttle=0.0))
+    assert shard_snapshot_path(snapshot, 1) == tmp_path / "backups" / "snapshot.shard1.db.gz"
+    assert all(shard_snapshot_path(snapshot, index).exists() for index in range(2))
+
+    for path in [main_db] + shards:
+        path.unlink()
+        create_database(path, 5)
+    cli.restore(argparse.Namespace(snapshot=snapshot, target=None))
+    assert [count_users(path) for path in [main_db] + shards] == [0, 1, 2]
+
+    shard_snapshot_path(snapshot, 1).unlink()
+    with pytest.raises(SystemExit):
+        cli.restore(argparse.Namespace(snapshot=snapshot, target=None))
+
+
+def test_restore_rejects_invalid_snapshot(tmp_path):
+    """Test that a corrupt snapshot is rejected before anything is written"""
+    snapshot = tmp_path / "corrupt.db"
+    snapshot.write_bytes(b"not a database" * 100)
+    target = tmp_path / "target.db"
+    with pytest.raises(ValueError):
+        restore_database(snapshot, target)
+    assert not target.exists()
+
+
+def test_read_backup_not_found(client):
+    """Test reading an unknown backup"""
+    response = client.get("/admin/backups/unknown")
+    assert response.status_code == 404
+    assert response.json()["message"] == "Backup not found with ID: unknown"
+
+
+def test_admin_requires_key(client, monkeypatch: pytest.MonkeyPatch):
+    """Test that the admin routes need the configured key and are disabled without one"""
+    anonymous = TestClient(app)
+    assert anonymous.get("/admin/user-filter").status_code == 403
+    assert anonymous.get("/admin/user-filter", headers={"X-API-Key": "wrong"}).status_code == 403
+    assert client.get("/admin/user-filter").status_code == 200
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", None)
+    assert client.get("/admin/user-filter").status_code == 503
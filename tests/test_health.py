@@ -0,0 +1,153 @@
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(".")
+from core import database
+from core.cache import read_cache
+from core.changefeed import change_broadcaster
+from core.config import settings
+from main import app
+from models import Change, Item, ItemPublic
+
+
+def wait_until(predicate, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return
+        time.sleep(0.02)
+    raise AssertionError("Condition not met in time")
+
+
+def live_item_ids(client: TestClient) -> list[int]:
+    ids, after_id = [], 0
+    while page := client.get("/items/", params={"after_id": after_id, "limit": 100}).json()["data"]:
+        ids += [item["id"] for item in page]
+        after_id = ids[-1]
+    return ids
+
+
+def test_readiness(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Test that readiness waits for the read cache to be warm"""
+    with TestClient(app) as client:
+        assert client.get("/health/live").status_code == 200
+        wait_until(lambda: client.get("/health/ready").status_code == 200)
+        assert client.get("/health/ready").json()["data"] == {"read_cache": True, "user_filter": True}
+
+    response = TestClient(app).get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["message"] == "Application is not ready, waiting for: read_cache"
+
+
+def test_read_cache_follows_writes(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Test that cached pages and records are patched or reloaded after writes"""
+    monkeypatch.setattr(settings, "CACHE_REFRESH_DELAY", 0.5)
+    cache = read_cache.items
+    with TestClient(app) as client:
+        user = {"username": "cacheuser", "email": "cache@example.com", "password": "testpassword"}
+        owner_id = client.post("/users/", json=user).json()["data"]["id"]
+        ids = [
+            client.post(f"/items/?owner_id={owner_id}", json={"title": f"Cached {i}"}).json()["data"]["id"]
+            for i in range(4)
+        ]
+        all_ids = live_item_ids(client)
+        monkeypatch.setattr(cache, "page_size", 2)
+        monkeypatch.setattr(cache, "pages", len(all_ids) // 2 + 1)
+        offsets = range(0, cache.pages * 2, 2)
+        client.portal.call(cache.refresh)
+
+        def page(offset: int) -> list[dict]:
+            return client.get("/items/", params={"offset": offset, "limit": 2}).json()["data"]
+
+        def uncached(offset: int) -> list[dict]:
+            return client.get("/items/", params={"offset": offset, "limit": 3}).json()["data"][:2]
+
+        assert all(cache.page(offset, 2, None) for offset in offsets)
+        assert [page(offset) for offset in offsets] == [uncached(offset) for offset in offsets]
+        after_id = page(0)[-1]["id"]
+        assert cache.page(0, 2, after_id) == cache.page(2, 2, None)
+
+        position = all_ids.index(ids[0])
+        client.patch(f"/items/{ids[0]}", json={"title": "Patched"})
+        assert cache.page(position // 2 * 2, 2, None) is not None
+        assert page(position // 2 * 2)[position % 2]["title"] == "Patched"
+
+        position = all_ids.index(ids[3])
+        client.delete(f"/items/{ids[3]}")
+        assert cache.page(position // 2 * 2, 2, None) is None
+        assert cache.page(0, 2, None) is not None
+        wait_until(lambda: all(cache.page(offset, 2, None) for offset in offsets))
+        assert [page(offset) for offset in offsets] == [uncached(offset) for offset in offsets]
+
+        for _ in range(3):
+            client.get(f"/items/{ids[2]}")
+        client.portal.call(cache.refresh, 10)
+        assert ids[2] in cache.records
+        client.patch(f"/items/{ids[2]}", json={"description": "hot"})
+        with monkeypatch.context() as uncached_only:
+            # a cache hit must not open a database session
+            uncached_only.setattr(database, "create_session", None)
+            assert client.get(f"/items/{ids[2]}").json()["data"]["description"] == "hot"
+
+        async def delete_elsewhere():
+            async with AsyncSession(database.engine) as session:
+                await session.execute(
+                    update(Item).where(Item.id == ids[2]).values(deleted_at=datetime.now(timezone.utc))
+                )
+                await session.commit()
+
+        client.portal.call(delete_elsewhere)
+        assert ids[2] in cache.records
+        client.portal.call(cache.refresh, 10)
+        assert ids[2] not in cache.records
+        assert client.get(f"/items/{ids[2]}").status_code == 404
+        client.delete(f"/users/{owner_id}")
+
+    assert str(ids[2]) in json.loads((tmp_path / "reads.json").read_text())["item"]
+
+
+def test_read_cache_follows_other_workers(monkeypatch: pytest.MonkeyPatch):
+    """Test that changes committed by other workers reach the cached records through the change log"""
+    monkeypatch.setattr(change_broadcaster, "poll_interval", 0.05)
+    cache = read_cache.items
+    with TestClient(app) as client:
+        user = {"username": "followuser", "email": "follow@example.com", "password": "testpassword"}
+        owner_id = client.post("/users/", json=user).json()["data"]["id"]
+        item_id = client.post(f"/items/?owner_id={owner_id}", json={"title": "Followed"}).json()["data"]["id"]
+        for _ in range(3):
+            client.get(f"/items/{item_id}")
+        client.portal.call(cache.refresh, 10)
+        assert item_id in cache.records
+
+        async def update_elsewhere():
+            # a change that only reaches this worker through the change log
+            async with AsyncSession(database.engine, expire_on_commit=False) as session:
+                item = await session.get(Item, item_id)
+                item.title = "Changed elsewhere"
+                session.add(
+                    Change(
+                        entity="item",
+                        op="update",
+                        entity_id=item_id,
+                        data=ItemPublic.model_validate(item).model_dump(mode="json"),
+                    )
+                )
+                await session.commit()
+
+        client.portal.call(update_elsewhere)
+        wait_until(lambda: cache.records[item_id].title == "Changed elsewhere")
+
+        # the feed echoes local writes after they were applied, and must not bring back an older one
+        for title in ("Local 1", "Local 2"):
+            client.patch(f"/items/{item_id}", json={"title": title})
+        time.sleep(0.3)
+        assert cache.records[item_id].title == "Local 2"
+        client.delete(f"/users/{owner_id}")
+        wait_until(lambda: item_id not in cache.records)
@@ -1,12 +1,25 @@
+import asyncio
+import json
 import sys
+import time
 
 import httpx
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
 from test_user import assert_404 as assert_404_user
 
 sys.path.append(".")
+from core.changefeed import change_broadcaster
+from core.config import settings
+from core.database import engine
+from core.deadline import _route_timeout, deadline_scope, get_deadline
+from core.purge import tombstone_purger
 from main import app
+from models import Item, ItemPublic
 
 client = TestClient(app)
 
@@ -81,6 +94,23 @@ def test_read_items():
     assert isinstance(response.json()["data"], list)
 
 
+def test_read_items_matches_orm(user_id):
+    """Test that the Core list path renders the same page as the ORM models"""
+    for index in range(3):
+        client.post(f"/items/?owner_id={user_id}", json={"title": f"Page Item {index}", "description": None})
+
+    async def orm_page(after_id: int) -> list[dict]:
+        async with AsyncSession(engine) as session:
+            live = select(Item).where(Item.id > after_id, Item.deleted_at.is_(None))
+            items = await session.execute(live.order_by(Item.id).limit(2))
+            return [ItemPublic.model_validate(item).model_dump() for item in items.scalars()]
+
+    first = client.get("/items/", params={"limit": 1}).json()["data"][0]
+    response = client.get("/items/", params={"after_id": first["id"], "limit": 2})
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["data"] == asyncio.run(orm_page(first["id"]))
+
+
 def test_read_item(item_id):
     """Test reading a specific item"""
     response = client.get(f"/items/{item_id}")
@@ -119,6 +149,12 @@ def test_update_item(item_id):
     )
     assert_404(response, item_id + 1)
 
+    response = client.patch(f"/items/{item_id}", json={"title": None, "description": None})
+    assert response.status_code == 422
+    response = client.patch(f"/items/{item_id}", json={"description": None})
+    assert response.status_code == 200
+    assert response.json()["data"]["description"] is None
+
 
 def test_delete_item(item_id):
     """Test deleting a specific item"""
@@ -130,3 +166,244 @@ def test_delete_item(item_id):
 
     response = client.delete(f"/items/{item_id + 1}")
     assert_404(response, item_id + 1)
+
+
+def read_changes(last_event_id: str | None = None) -> tuple[list[dict], str]:
+    """Page through the item change feed after a position, or from now, and return the changes and the next position"""
+    changes = []
+    while True:
+        headers = {"Last-Event-ID": last_event_id} if last_event_id is not None else {}
+        response = client.get("/items/changes", params={"timeout": 0}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["message"] == "Item changes retrieved successfully"
+        batch = response.json()["data"]
+        changes += batch
+        last_event_id = response.headers["Last-Event-ID"]
+        if batch:
+            assert last_event_id == batch[-1]["cursor"]
+        else:
+            return changes, last_event_id
+
+
+def test_bulk_update_and_delete_items(user_id, monkeypatch: pytest.MonkeyPatch):
+    """Test bulk updates and deletes by ID list and by filter"""
+    monkeypatch.setattr(settings, "BULK_CHUNK_SIZE", 2)
+    ids = [
+        client.post(f"/items/?owner_id={user_id}", json={"title": f"Bulk {i}"}).json()["data"]["id"] for i in range(5)
+    ]
+
+    response = client.patch("/items/bulk", json={"ids": ids[:3] + [0], "values": {"description": "bulk"}})
+    assert response.status_code == 200
+    result = response.json()["data"]
+    assert result["counts"] == {"updated": 3, "not_found": 1}
+    assert result["outcomes"] == {**{str(item_id): "updated" for item_id in ids[:3]}, "0": "not_found"}
+    assert client.get(f"/items/{ids[2]}").json()["data"]["description"] == "bulk"
+    assert client.get(f"/items/{ids[3]}").json()["data"]["description"] is None
+
+    response = client.request("DELETE", "/items/bulk", json={"ids": ids[:2]})
+    assert response.json()["data"]["counts"] == {"deleted": 2, "not_found": 0}
+    assert_404(client.get(f"/items/{ids[0]}"), ids[0])
+
+    response = client.request("DELETE", "/items/bulk", json={"filter": {"owner_id": user_id}})
+    assert response.json()["data"]["counts"] == {"deleted": 3, "not_found": 0}
+    assert client.request("DELETE", "/items/bulk", json={"filter": {}}).status_code == 422
+    assert client.patch("/items/bulk", json={"ids": ids, "values": {}}).status_code == 422
+
+
+def test_import_items(user_id, tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Test streaming CSV and NDJSON imports with rejected rows"""
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(settings, "IMPORT_REPORT_DIR", str(tmp_path))
+    marker = client.post(f"/items/?owner_id={user_id}", json={"title": "Before import"}).json()["data"]["id"]
+    csv_body = (
+        f'title,description,owner_id\nFirst,"two\nlines, quoted",{user_id}\nSecond,,{user_id}\n,no title,{user_id}\n'
+    )
+    response = client.post("/items/import", content=csv_body, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    summary = response.json()["data"]
+    assert (summary["read"], summary["imported"], summary["rejected"]) == (3, 2, 1)
+
+    ndjson_body = "\n".join(
+        [
+            json.dumps({"title": "Third", "owner_id": user_id}),
+            json.dumps({"title": "Orphan", "owner_id": 0}),
+            "not json",
+        ]
+    )
+    response = client.post("/items/import?format=ndjson", content=ndjson_body)
+    summary = response.json()["data"]
+    assert (summary["read"], summary["imported"], summary["rejected"]) == (3, 1, 2)
+    report = [json.loads(line) for line in open(summary["report"])]
+    assert [entry["line"] for entry in report if "error" in entry] == [2, 3]
+    assert report[-1]["done"] == summary
+
+    imported = client.get("/items/", params={"after_id": marker}).json()["data"]
+    assert {item["title"]: item["description"] for item in imported} == {
+        "First": "two\nlines, quoted",
+        "Second": None,
+        "Third": None,
+    }
+    assert client.post("/items/import", content=ndjson_body).status_code == 415
+
+
+def test_import_csv_stray_quote(user_id, tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Test that a stray quote in a CSV import rejects one row instead of the rest of the file"""
+    monkeypatch.setattr(settings, "IMPORT_REPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "IMPORT_MAX_RECORD_LINES", 5)
+    rows = [f"Row {index},,{user_id}" for index in range(20)]
+    rows[3] = f'Row "3,,{user_id}'
+    csv_body = "title,description,owner_id\n" + "\n".join(rows) + "\n"
+    response = client.post("/items/import", content=csv_body, headers={"Content-Type": "text/csv"})
+    summary = response.json()["data"]
+    assert (summary["read"], summary["imported"], summary["rejected"]) == (20, 19, 1)
+    report = [json.loads(line) for line in open(summary["report"])]
+    assert [(entry["line"], entry["error"]) for entry in report if "error" in entry] == [
+        (5, "Unterminated quoted field")
+    ]
+
+    rows[-1] = f'Row "19,,{user_id}'
+    response = client.post(
+        "/items/import",
+        content="title,description,owner_id\n" + "\n".join(rows[15:]),
+        headers={"Content-Type": "text/csv"},
+    )
+    summary = response.json()["data"]
+    assert (summary["read"], summary["imported"], summary["rejected"]) == (5, 4, 1)
+
+
+def test_read_item_changes(user_id):
+    """Test that item writes show up in the change feed"""
+    _, last_event_id = read_changes()
+    response = client.post(f"/items/?owner_id={user_id}", json={"title": "Feed Item"})
+    item_id = response.json()["data"]["id"]
+    client.delete(f"/items/{item_id}")
+
+    changes, _ = read_changes(last_event_id)
+    assert [(change["op"], change["entity_id"]) for change in changes] == [("create", item_id), ("delete", item_id)]
+    assert changes[0]["data"]["title"] == "Feed Item"
+
+    for accept in ("application/json", "text/event-stream"):
+        response = client.get("/items/changes", headers={"Last-Event-ID": "abc", "Accept": accept})
+        assert response.status_code == 422
+
+
+def test_purged_change_feed_position(user_id, monkeypatch: pytest.MonkeyPatch):
+    """Test that resuming from a position whose changes were purged is rejected with 410"""
+    _, last_event_id = read_changes()
+    for title in ("Purged 1", "Purged 2"):
+        client.post(f"/items/?owner_id={user_id}", json={"title": title})
+    monkeypatch.setattr(tombstone_purger, "change_retention", 0)
+    asyncio.run(tombstone_purger.purge())
+
+    response = client.get("/items/changes", params={"timeout": 0}, headers={"Last-Event-ID": last_event_id})
+    assert response.status_code == 410
+    assert response.json()["status"] == "error"
+    response = client.get("/items/changes", params={"timeout": 0})
+    assert response.status_code == 200
+
+
+def test_idle_change_feed_position(user_id, monkeypatch: pytest.MonkeyPatch):
+    """Test that the position of an idle item feed moves past user changes, so purging them does not reject it"""
+    _, last_event_id = read_changes()
+    client.patch(f"/users/{user_id}", json={"email": f"idle{user_id}@example.com"})
+    changes, idle_event_id = read_changes(last_event_id)
+    assert changes == []
+    assert idle_event_id != last_event_id
+
+    monkeypatch.setattr(tombstone_purger, "change_retention", 0)
+    asyncio.run(tombstone_purger.purge())
+    response = client.get("/items/changes", params={"timeout": 0}, headers={"Last-Event-ID": idle_event_id})
+    assert response.status_code == 200
+    assert response.headers["Last-Event-ID"] == idle_event_id
+
+
+def test_read_items_compressed(user_id):
+    """Test that large list responses are compressed for clients that accept gzip"""
+    for _ in range(10):
+        client.post(f"/items/?owner_id={user_id}", json={"title": "Compressed Item", "description": "x" * 100})
+
+    response = client.get("/items/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json()["message"] == "Items retrieved successfully"
+
+    response = client.get("/items/", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_read_items_overloaded(monkeypatch):
+    """Test that reads are shed with 503 once the in-flight limit is reached"""
+    monkeypatch.setattr(settings, "ADMISSION_MAX_INFLIGHT_READS", 0)
+    response = client.get("/items/")
+    assert response.status_code == 503
+    assert response.json()["message"] == "Service overloaded"
+    assert response.headers["retry-after"] == "1"
+
+
+def test_read_items_deadline_exceeded():
+    """Test that a request past its deadline fails with 504"""
+    response = client.get("/items/", headers={"X-Request-Timeout": "0.000001"})
+    assert response.status_code == 504
+    assert response.json()["status"] == "error"
+    assert response.json()["message"] == "Request deadline exceeded"
+
+
+def test_request_timeout_header_clamped():
+    """Test that X-Request-Timeout can shorten the deadline of a route but not lift it"""
+    route = {"type": "http", "method": "GET", "path": "/items/", "headers": []}
+
+    def timeout(value: str) -> float:
+        return _route_timeout({**route, "headers": [(b"x-request-timeout", value.encode())]})
+
+    assert timeout("2") == 2
+    assert timeout("1000") == settings.REQUEST_TIMEOUT_READ
+    for value in ("0", "-1", "nan", "inf", "abc"):
+        assert timeout(value) == settings.REQUEST_TIMEOUT_READ
+    assert _route_timeout({**route, "path": "/items/changes", "headers": [(b"x-request-timeout", b"1e9")]}) == (
+        settings.REQUEST_TIMEOUT_MAX
+    )
+
+
+def test_change_feed_poller_ignores_request_deadline(monkeypatch: pytest.MonkeyPatch):
+    """Test that the shared change feed poller does not inherit the deadline of the request starting it"""
+    deadlines = []
+
+    async def head() -> list[int]:
+        deadlines.append(get_deadline())
+        return [0]
+
+    async def listen_once():
+        with deadline_scope(30):
+            listener = change_broadcaster.listen("item", None, 0.05)
+            assert await anext(listener) == ([], "0")
+            await listener.aclose()
+        await change_broadcaster.close()
+
+    monkeypatch.setattr(change_broadcaster, "_head", head)
+    asyncio.run(listen_once())
+    assert None in deadlines
+
+
+def test_statement_interrupted_at_deadline():
+    """Test that a running SQLite statement is interrupted once the deadline passes"""
+    slow_query = text(
+        "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) SELECT count(*) FROM n"
+    )
+
+    async def run_slow_query():
+        with deadline_scope(0.05):
+            async with AsyncSession(engine) as session:
+                await session.execute(slow_query)
+
+    started = time.monotonic()
+    with pytest.raises(OperationalError, match="interrupted"):
+        asyncio.run(run_slow_query())
+    assert time.monotonic() - started < 5
+
+    async def run_fast_query():
+        async with AsyncSession(engine) as session:
+            return (await session.execute(text("SELECT 1"))).scalar()
+
+    assert asyncio.run(run_fast_query()) == 1
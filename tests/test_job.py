@@ -0,0 +1,200 @@
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+sys.path.append(".")
+from core.config import settings
+from core.database import engine
+from core.jobs import JobContext, JobRunner, LeaseLostError, _handlers, job_runner
+from main import app
+from models import Job, JobInput
+
+
+def wait_for_job(client: TestClient, job_id: int) -> dict:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        response = client.get(f"/jobs/{job_id}")
+        assert response.status_code == 200
+        job = response.json()["data"]
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def create_user(client: TestClient) -> int:
+    response = client.post(
+        "/users/",
+        json={"email": "jobs@example.com", "password": "testpassword", "username": "jobuser"},
+    )
+    assert response.status_code == 200
+    return response.json()["data"]["id"]
+
+
+def test_bulk_delete_user(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "JOB_CHUNK_SIZE", 3)
+    with TestClient(app) as client:
+        user_id = create_user(client)
+        for index in range(7):
+            response = client.post(f"/items/?owner_id={user_id}", json={"title": f"Item {index}"})
+            assert response.status_code == 200
+
+        response = client.post("/jobs/", json={"kind": "bulk_delete", "params": {"user_id": user_id}})
+        assert response.status_code == 200
+        job = wait_for_job(client, response.json()["data"]["id"])
+        assert job["status"] == "completed"
+        assert job["progress"] == job["total"] == 8
+        assert client.get(f"/users/{user_id}").status_code == 404
+
+
+def test_bulk_import_resumes_from_checkpoint():
+    with TestClient(app) as client:
+        user_id = create_user(client)
+        items = [{"title": f"Imported {index}", "owner_id": user_id} for index in range(4)]
+        items.append({"title": "Orphan", "owner_id": -1})
+
+    async def insert_interrupted_job() -> int:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            job = Job(
+                kind="bulk_import",
+                params={"count": len(items)},
+                status="running",
+                progress=2,
+                total=len(items),
+                checkpoint={"position": 2, "rejected": 0},
+            )
+            session.add(job)
+            await session.flush()
+            session.add_all(
+                JobInput(job_id=job.id, position=position, data=data) for position, data in enumerate(items)
+            )
+            await session.commit()
+            return job.id
+
+    job_id = asyncio.run(insert_interrupted_job())
+    with TestClient(app) as client:
+        job = wait_for_job(client, job_id)
+        assert job["status"] == "completed"
+        assert job["progress"] == 4
+
+        titles = [item["title"] for item in client.get("/items/").json()["data"] if item["owner_id"] == user_id]
+        assert titles == ["Imported 2", "Imported 3"]
+        client.delete(f"/users/{user_id}")
+
+    async def count_inputs() -> int:
+        async with AsyncSession(engine) as session:
+            result = await session.execute(select(JobInput).where(JobInput.job_id == job_id))
+            return len(result.scalars().all())
+
+    assert asyncio.run(count_inputs()) == 0
+
+
+def test_job_runner_survives_failed_job(monkeypatch: pytest.MonkeyPatch):
+    finish = JobRunner._finish
+    calls = []
+
+    async def flaky_finish(runner: JobRunner, job_id: int, status: str, error: str | None = None):
+        calls.append(status)
+        if len(calls) == 1:
+            raise OperationalError("UPDATE job", {}, Exception("database is locked"))
+        await finish(runner, job_id, status, error)
+
+    monkeypatch.setattr(job_runner, "concurrency", 1)
+    monkeypatch.setattr(JobRunner, "_finish", flaky_finish)
+    with TestClient(app) as client:
+        first = client.post("/jobs/", json={"kind": "reindex"}).json()["data"]["id"]
+        second = client.post("/jobs/", json={"kind": "reindex"}).json()["data"]["id"]
+        assert wait_for_job(client, first)["status"] == "failed"
+        assert wait_for_job(client, second)["status"] == "completed"
+
+
+def test_create_job_invalid_params():
+    with TestClient(app) as client:
+        response = client.post("/jobs/", json={"kind": "bulk_delete", "params": {}})
+        assert response.status_code == 422
+        assert client.get("/jobs/0").status_code == 404
+
+
+def test_reindex():
+    with TestClient(app) as client:
+        response = client.post("/jobs/", json={"kind": "reindex"})
+        assert response.status_code == 200
+        job = wait_for_job(client, response.json()["data"]["id"])
+        assert job["status"] == "completed"
+        assert job["progress"] == job["total"]
+
+
+def test_job_lease():
+    """Test that a job is claimed by one runner only and taken over once its lease expires"""
+    runners = [JobRunner(1, 10, 60), JobRunner(1, 10, 60)]
+
+    async def scenario():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            job = Job(kind="reindex")
+            session.add(job)
+            await session.commit()
+        claims = await asyncio.gather(*(runner._claim(job.id) for runner in runners))
+        assert len([claim for claim in claims if claim is not None]) == 1
+        owner, other = runners if claims[0] is not None else runners[::-1]
+        claim = claims[0] or claims[1]
+        assert claim.owner == owner.owner
+        assert job.id not in await other._scan()
+
+        async with AsyncSession(engine) as session:
+            stale = datetime.now(timezone.utc) - timedelta(seconds=120)
+            await session.execute(update(Job).where(Job.id == job.id).values(heartbeat=stale))
+            await session.commit()
+        assert job.id in await other._scan()
+        assert (await other._claim(job.id)).owner == other.owner
+        with pytest.raises(LeaseLostError):
+            await JobContext(claim).commit(None, 1, {})
+        await owner._finish(job.id, "failed")
+        await other._finish(job.id, "completed")
+        async with AsyncSession(engine) as session:
+            assert (await session.get(Job, job.id)).status == "completed"
+
+    asyncio.run(scenario())
+
+
+def test_job_runner_stops_after_chunk(monkeypatch: pytest.MonkeyPatch):
+    """Test that stopping the runner lets a running job commit its current chunk and leaves it to resume"""
+    runner = JobRunner(1, 10, 60)
+
+    async def scenario():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def handler(context: JobContext):
+            await context.commit(None, 1, {"position": 1})
+            started.set()
+            await release.wait()
+            await context.commit(None, 2, {"position": 2})
+            await context.commit(None, 3, {"position": 3})
+
+        monkeypatch.setitem(_handlers, "stoppable", handler)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            job = Job(kind="stoppable")
+            session.add(job)
+            await session.commit()
+
+        runner._workers = [asyncio.create_task(runner._run(job.id))]
+        await started.wait()
+        stopping = asyncio.create_task(runner.stop())
+        await asyncio.sleep(0.1)
+        assert not stopping.done()
+        release.set()
+        await stopping
+
+        async with AsyncSession(engine) as session:
+            job = await session.get(Job, job.id)
+            assert (job.status, job.progress, job.checkpoint) == ("running", 2, {"position": 2})
+        await runner._finish(job.id, "failed")
+
+    asyncio.run(scenario())
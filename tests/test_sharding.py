@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+sys.path.append(".")
+
+from core.bloom import user_filter
+from core.exceptions import ConflictError
+from core.sharding import ShardRouter, rebalance
+from models import ItemCreate, UserBulkUpdate, UserCreate, UserUpdate
+from services import ItemService, UserService
+
+
+@pytest.fixture
+def router(tmp_path):
+    """Create a router over three empty shards"""
+    main = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/main.db")
+    router = ShardRouter([f"sqlite+aiosqlite:///{tmp_path}/shard{index}.db" for index in range(3)], main)
+    yield router
+
+    async def dispose():
+        for shard_engine in [main, *router.engines.values()]:
+            await shard_engine.dispose()
+
+    asyncio.run(dispose())
+
+
+def count_rows(path, table: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f'SELECT count(*) FROM "{table}" WHERE deleted_at IS NULL').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_users_and_items_are_routed_by_owner(router):
+    """Test that every user and its items land on one shard and listings merge across shards"""
+
+    async def scenario():
+        await router.init_shards()
+        async with router.session(expire_on_commit=False) as session:
+            users, items = UserService(session), ItemService(session)
+            owners = []
+            for index in range(3):
+                user = await users.create_user(
+                    UserCreate(username=f"user{index}", email=f"user{index}@example.com", password="secret")
+                )
+                owners.append(user.id)
+                for title in ("first", "second"):
+                    await items.create_item(ItemCreate(title=title), user.id)
+
+            page = await items.read_item_rows(0, 100)
+            assert [item.id for item in page] == sorted(item.id for item in page)
+            assert len(page) == 6
+            assert [item.id for item in await items.read_item_rows(2, 2)] == [item.id for item in page[2:4]]
+            assert [item.id for item in await items.read_item_rows(0, 10, page[3].id)] == [item.id for item in page[4:]]
+            assert [user.id for user in await users.read_user_rows(0, 100)] == sorted(owners)
+
+            item = await items.read_item(page[0].id)
+            assert item.title == page[0].title
+            await users.delete_user(owners[0])
+            assert all(item.owner_id != owners[0] for item in await items.read_item_rows(0, 100))
+            return owners, page
+
+    owners, page = asyncio.run(scenario())
+    assert len({router.shard_for(owner) for owner in owners}) == 3
+    assert all(router.shard_for(item.id) == router.shard_for(item.owner_id) for item in page)
+    for index, path in enumerate(router.paths()):
+        users = 0 if router.shard_for(owners[0]) == str(index) else 1
+        assert count_rows(path, "user") == users
+        assert count_rows(path, "item") == 2 * users
+
+
+def test_unique_values_across_shards(router, monkeypatch: pytest.MonkeyPatch):
+    """Test that usernames stay unique across shards, for concurrent creates and bulk updates"""
+    # the user filter follows the application's databases, not these shards
+    monkeypatch.setattr(user_filter, "ready", False)
+
+    async def create(username: str, email: str):
+        async with router.session(expire_on_commit=False) as session:
+            return await UserService(session).create_user(UserCreate(username=username, email=email, password="secret"))
+
+    async def scenario():
+        await router.init_shards()
+        results = await asyncio.gather(
+            create("same", "first@example.com"), create("same", "second@example.com"), return_exceptions=True
+        )
+        assert sorted(type(result).__name__ for result in results) == ["ConflictError", "User"]
+
+        others = [await create(f"other{index}", f"other{index}@example.com") for index in range(2)]
+        assert len({router.shard_for(user.id) for user in others}) == 2
+        async with router.session(expire_on_commit=False) as session:
+            users = UserService(session)
+            for ids in ([others[0].id], [user.id for user in others]):
+                with pytest.raises(ConflictError):
+                    await users.bulk_update_users(UserBulkUpdate(ids=ids, values=UserUpdate(username="same")))
+            assert [user.username for user in await users.read_user_rows(0, 100)] == ["same", "other0", "other1"]
+
+    asyncio.run(scenario())
+
+
+def test_import_into_shards(router, tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Test that the import command writes every chunk to the owner's shard with IDs from that shard's sequence"""
+    monkeypatch.setattr(user_filter, "ready", False)
+
+    async def create_owners() -> list[int]:
+        await router.init_shards()
+        async with router.session(expire_on_commit=False) as session:
+            users = UserService(session)
+            return [
+                (
+                    await users.create_user(
+                        UserCreate(username=f"owner{index}", email=f"owner{index}@example.com", password="secret")
+                    )
+                ).id
+                for index in range(3)
+            ]
+
+    owners = asyncio.run(create_owners())
+    records = [{"title": f"item{index}", "owner_id": owners[index % 3]} for index in range(5)]
+    records.insert(2, {"title": "orphan", "owner_id": -1})
+    source = tmp_path / "items.ndjson"
+    source.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{tmp_path}/main.db",
+        "SHARD_URLS": json.dumps(router.urls),
+    }
+    result = subprocess.run(
+        [sys.executable, "cli.py", "import", str(source), "--chunk-size", "2"], env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert "Read 6 records: 5 imported, 1 rejected" in result.stdout
+
+    titles = {}
+    for index, path in enumerate(router.paths()):
+        conn = sqlite3.connect(path)
+        try:
+            items = conn.execute("SELECT id, owner_id, title FROM item").fetchall()
+            user_ids = [row[0] for row in conn.execute("SELECT id FROM user")]
+            (sequence,) = conn.execute("SELECT value FROM shard_sequence WHERE name = 'id'").fetchone()
+            changes = {row[0] for row in conn.execute("SELECT entity_id FROM change WHERE entity = 'item'")}
+        finally:
+            conn.close()
+        assert all(router.shard_for(owner_id) == str(index) for _, owner_id, _ in items)
+        # users and items share the shard's sequence, which allocated every ID once
+        assert sorted(user_ids + [item_id for item_id, _, _ in items]) == [
+            n * 3 + index for n in range(1, sequence + 1)
+        ]
+        assert changes == {item_id for item_id, _, _ in items}
+        titles.update({title: owner_id for _, owner_id, title in items})
+    assert titles == {record["title"]: record["owner_id"] for record in records if record["owner_id"] != -1}
+
+
+def test_rebalance_single_database(router, tmp_path):
+    """Test copying a single database into shards keeps IDs and lets new rows continue past them"""
+    source = tmp_path / "single.db"
+    sync_engine = create_engine(f"sqlite:///{source}")
+    SQLModel.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+    conn = sqlite3.connect(source)
+    conn.executemany(
+        "INSERT INTO user (id, username, email, password) VALUES (?, ?, ?, ?)",
+        [(user_id, f"user{user_id}", f"user{user_id}@example.com", "secret") for user_id in range(1, 6)],
+    )
+    conn.executemany(
+        "INSERT INTO item (id, title, owner_id) VALUES (?, ?, ?)",
+        [(item_id, f"item{item_id}", item_id % 5 + 1) for item_id in range(1, 21)],
+    )
+    conn.commit()
+    conn.close()
+
+    rebalance(source, router, batch_size=3)
+    assert sum(count_rows(path, "user") for path in router.paths()) == 5
+    assert sum(count_rows(path, "item") for path in router.paths()) == 20
+
+    async def scenario():
+        await router.init_shards()
+        async with router.session(expire_on_commit=False) as session:
+            items = ItemService(session)
+            assert (await items.read_item(7)).owner_id == 3
+            assert [item.id for item in await items.read_item_rows(0, 100)] == list(range(1, 21))
+            new_item = await items.create_item(ItemCreate(title="new"), 2)
+            user = await UserService(session).create_user(
+                UserCreate(username="new", email="new@example.com", password="secret")
+            )
+            return new_item, user
+
+    new_item, user = asyncio.run(scenario())
+    assert new_item.id > 20
+    assert router.shard_for(new_item.id) == router.shard_for(2)
+    assert user.id > 20
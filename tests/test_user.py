@@ -1,12 +1,27 @@
+import asyncio
+import sqlite3
 import sys
+from collections import OrderedDict
 
 import httpx
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
 
 sys.path.append(".")
 
+from test_health import wait_until
+
+from core import database
+from core.admission import RateLimiter, rate_limiter
+from core.backup import database_path
+from core.bloom import CountingBloomFilter, user_filter
+from core.changefeed import record_change
+from core.config import settings
+from core.database import engine
+from core.purge import tombstone_purger
 from main import app
+from models import User, UserPublic
 
 client = TestClient(app)
 
@@ -82,6 +97,13 @@ def test_update_user(user_id):
     )
     assert_404(response, user_id + 1)
 
+    for path, body in (
+        (f"/users/{user_id}", {"username": None}),
+        ("/users/bulk", {"ids": [user_id], "values": {"email": None}}),
+    ):
+        response = client.patch(path, json=body)
+        assert response.status_code == 422
+
 
 def test_delete_user(user_id):
     """Test deleting a specific user"""
@@ -93,3 +115,172 @@ def test_delete_user(user_id):
 
     response = client.delete(f"/users/{user_id + 1}")
     assert_404(response, user_id + 1)
+
+
+def test_soft_delete_and_purge(user_id, monkeypatch: pytest.MonkeyPatch):
+    """Test that deleted users and their items are hidden at once and removed by the purge"""
+    item_id = client.post(f"/items/?owner_id={user_id}", json={"title": "Test Item"}).json()["data"]["id"]
+    assert client.delete(f"/users/{user_id}").status_code == 200
+    assert_404(client.get(f"/users/{user_id}"), user_id)
+    assert_404(client.delete(f"/users/{user_id}"), user_id)
+    assert client.get(f"/items/{item_id}").status_code == 404
+
+    def tombstones() -> tuple[int, int]:
+        conn = sqlite3.connect(database_path())
+        try:
+            return tuple(
+                conn.execute(
+                    f'SELECT count(*) FROM "{table}" WHERE id = ? AND deleted_at IS NOT NULL', (row_id,)
+                ).fetchone()[0]
+                for table, row_id in (("user", user_id), ("item", item_id))
+            )
+        finally:
+            conn.close()
+
+    assert tombstones() == (1, 1)
+    monkeypatch.setattr(tombstone_purger, "retention", 0)
+    assert asyncio.run(tombstone_purger.purge()) >= 2
+    assert tombstones() == (0, 0)
+
+
+def test_user_exists_and_duplicates(user_id, monkeypatch: pytest.MonkeyPatch):
+    """Test existence checks and that live users cannot share a username or email"""
+    response = client.get("/users/exists", params={"username": "testuser", "email": "free@example.com"})
+    assert response.status_code == 200
+    assert response.json()["data"] == {"username": True, "email": False}
+    assert client.get("/users/exists").status_code == 422
+
+    duplicate = {"email": "other@example.com", "password": "testpassword", "username": "testuser"}
+    response = client.post("/users/", json=duplicate)
+    assert response.status_code == 409
+    assert response.json()["message"] == "User with username already exists: testuser"
+    assert client.patch(f"/users/{user_id}", json={"email": "test@example.com"}).status_code == 200
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "test-admin-key")
+    with TestClient(app) as started:
+        stats = started.get("/admin/user-filter", headers={"X-API-Key": "test-admin-key"}).json()["data"]
+        assert stats["username"]["ready"] is True
+        assert stats["username"]["memory_bytes"] > 0
+        assert started.get("/users/exists", params={"username": "testuser"}).json()["data"] == {"username": True}
+        assert started.delete(f"/users/{user_id}").status_code == 200
+        assert started.get("/users/exists", params={"username": "testuser"}).json()["data"] == {"username": False}
+        response = started.post("/users/", json=duplicate)
+        assert response.status_code == 200
+        started.delete(f"/users/{response.json()['data']['id']}")
+
+
+def test_user_filter_follows_other_workers(monkeypatch: pytest.MonkeyPatch):
+    """Test that the user filter picks up users written by another worker and forgets values renamed in bulk"""
+    monkeypatch.setattr(user_filter, "sync_interval", 0.05)
+
+    async def create_elsewhere() -> int:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            user = User(username="elsewhere", email="elsewhere@example.com", password="secret")
+            session.add(user)
+            await session.flush()
+            record_change(session, "user", "create", user.id, UserPublic.model_validate(user))
+            await session.commit()
+            return user.id
+
+    with TestClient(app) as started:
+        with monkeypatch.context() as uncached_only:
+            # negative answers come from the filter alone
+            uncached_only.setattr(database, "create_session", None)
+            response = started.get("/users/exists", params={"username": "elsewhere"})
+            assert response.json()["data"] == {"username": False}
+
+        user_id = started.portal.call(create_elsewhere)
+        wait_until(lambda: user_filter.might_exist("username", "elsewhere"))
+        assert started.get("/users/exists", params={"username": "elsewhere"}).json()["data"] == {"username": True}
+        response = started.patch("/users/bulk", json={"ids": [user_id], "values": {"username": "renamed"}})
+        assert response.json()["data"]["counts"] == {"updated": 1, "not_found": 0}
+        assert not user_filter.might_exist("username", "elsewhere")
+        assert user_filter.might_exist("username", "renamed")
+        assert started.delete(f"/users/{user_id}").status_code == 200
+
+
+def test_counting_bloom_filter():
+    """Test that the filter has no false negatives and forgets removed values"""
+    bloom = CountingBloomFilter(capacity=1000, error_rate=0.01)
+    values = [f"user{index}" for index in range(1000)]
+    for value in values:
+        bloom.add(value)
+    assert all(bloom.might_contain(value) for value in values)
+    false_positives = sum(bloom.might_contain(f"other{index}") for index in range(10_000))
+    assert false_positives < 300
+    for value in values:
+        bloom.remove(value)
+    assert not any(bloom.might_contain(value) for value in values)
+
+
+def test_bulk_delete_users(user_id):
+    """Test that bulk deleting users also deletes their items"""
+    item_id = client.post(f"/items/?owner_id={user_id}", json={"title": "Test Item"}).json()["data"]["id"]
+    response = client.patch("/users/bulk", json={"ids": [user_id], "values": {"password": "changed"}})
+    assert response.json()["data"]["counts"] == {"updated": 1, "not_found": 0}
+
+    response = client.request("DELETE", "/users/bulk", json={"filter": {"username": "testuser"}})
+    assert response.status_code == 200
+    assert response.json()["data"] == {"counts": {"deleted": 1, "not_found": 0}, "outcomes": {str(user_id): "deleted"}}
+    assert_404(client.get(f"/users/{user_id}"), user_id)
+    assert client.get(f"/items/{item_id}").status_code == 404
+
+
+def test_create_user_idempotent():
+    """Test that retrying a create with the same Idempotency-Key replays the first response"""
+    payload = {"email": "retry@example.com", "password": "testpassword", "username": "retryuser"}
+    headers = {"Idempotency-Key": "test-create-user-idempotent"}
+    first = client.post("/users/", json=payload, headers=headers)
+    assert first.status_code == 200
+    user_id = first.json()["data"]["id"]
+
+    retry = client.post("/users/", json=payload, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json()["data"]["id"] == user_id
+
+    conflict = client.post("/users/", json={**payload, "username": "otheruser"}, headers=headers)
+    assert conflict.status_code == 422
+    assert conflict.json()["status"] == "error"
+
+    other_payload = {**payload, "username": "otherclient", "email": "other@example.com"}
+    other = client.post("/users/", json=other_payload, headers={**headers, "X-API-Key": "other-client"})
+    assert other.status_code == 200
+    assert "idempotent-replayed" not in other.headers
+
+    malformed = client.post("/users/", content=b"{}", headers={**headers, "Content-Length": "abc"})
+    assert malformed.status_code == 400
+
+    client.delete(f"/users/{user_id}")
+    client.delete(f"/users/{other.json()['data']['id']}")
+
+
+def test_rate_limit(monkeypatch):
+    """Test that a client exceeding its token bucket is rejected with 429"""
+    monkeypatch.setattr(rate_limiter, "rate", 0.01)
+    monkeypatch.setattr(rate_limiter, "burst", 2)
+    monkeypatch.setattr(rate_limiter, "_buckets", OrderedDict())
+    monkeypatch.setattr(settings, "API_KEYS", ["test-rate-limit", "test-rate-limit-other"])
+    headers = {"X-API-Key": "test-rate-limit"}
+    assert client.get("/users/", headers=headers).status_code == 200
+    assert client.get("/users/", headers=headers).status_code == 200
+
+    response = client.get("/users/", headers=headers)
+    assert response.status_code == 429
+    assert response.json()["status"] == "error"
+    assert int(response.headers["retry-after"]) >= 1
+    assert client.get("/users/", headers={"X-API-Key": "test-rate-limit-other"}).status_code == 200
+
+    # unknown keys share the bucket of the client address
+    assert client.get("/users/").status_code == 200
+    assert client.get("/users/", headers={"X-API-Key": "forged-1"}).status_code == 200
+    assert client.get("/users/", headers={"X-API-Key": "forged-2"}).status_code == 429
+
+
+def test_rate_limit_eviction():
+    """Test that clients are only evicted once their bucket has refilled"""
+    limiter = RateLimiter(rate=0.01, burst=1, max_clients=1)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("b") == 0
+    assert limiter.acquire("c") > 0
+    assert limiter.acquire("a") > 0
@@ -1,10 +1,13 @@
-from typing import Annotated
+import secrets
+from contextlib import asynccontextmanager
+from typing import Annotated, AsyncIterator
 
-from fastapi import Depends
+from fastapi import Depends, Header, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.database import get_session
-from services import ItemService, UserService
+from core.config import settings
+from core.database import get_main_session, get_session
+from services import ItemService, JobService, UserService
 
 AsyncSessionDep = Annotated[AsyncSession, Depends(get_session)]
 
@@ -33,3 +36,59 @@ def get_user_service(session: AsyncSessionDep) -> UserService:
         UserService: An instance of UserService.
     """
     return UserService(session)
+
+
+@asynccontextmanager
+async def item_service_scope() -> AsyncIterator[ItemService]:
+    """
+    Open an ItemService for routes that only need the database when the read cache misses.
+
+    Yields:
+        ItemService: An instance of ItemService, on a session managed like ``get_session``.
+    """
+    async with asynccontextmanager(get_session)() as session:
+        yield ItemService(session)
+
+
+@asynccontextmanager
+async def user_service_scope() -> AsyncIterator[UserService]:
+    """
+    Open a UserService for routes that only need the database when the read cache misses.
+
+    Yields:
+        UserService: An instance of UserService, on a session managed like ``get_session``.
+    """
+    async with asynccontextmanager(get_session)() as session:
+        yield UserService(session)
+
+
+def get_job_service(session: Annotated[AsyncSession, Depends(get_main_session)]) -> JobService:
+    """
+    Dependency to get a JobService instance with an AsyncSession on the main database.
+
+    Args:
+        session (AsyncSession): The async database session.
+
+    Returns:
+        JobService: An instance of JobService.
+    """
+    return JobService(session)
+
+
+def require_admin(x_api_key: Annotated[str | None, Header()] = None):
+    """
+    Dependency to restrict a route to administrators.
+
+    Requests must send ``ADMIN_API_KEY`` in the ``X-API-Key`` header. The admin routes are disabled until an admin
+    key is configured.
+
+    Args:
+        x_api_key (str | None): The API key sent by the client.
+
+    Raises:
+        HTTPException: If no admin key is configured, or the API key does not match.
+    """
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Admin API key not configured")
+    if x_api_key is None or not secrets.compare_digest(x_api_key.encode(), settings.ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin API key required")